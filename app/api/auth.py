@@ -1,46 +1,82 @@
+from datetime import timedelta
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from app.db.database import get_db
-from app.schemas.user import UserCreate, Token
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.api.authentication import get_current_user
+from app.core.security import (
+    ACCESS_TOKEN_EXPIRE_MINUTES,
+    SIGNED_CLAIMS,
+    create_access_token,
+    verify_and_update_password_async
+)
+from app.db.database import get_async_db
+from app.models.user import User
+from app.schemas.user import CurrentUser, UserCreate, Token
 from app.workflows.auth_workflow import AuthWorkflow
+from app.workers.client import AUTH_TASK_QUEUE, get_temporal_client
 from temporalio.client import Client
-from dotenv import load_dotenv
-import os
-
-load_dotenv()
 
 router = APIRouter()
 
+def issue_token(user_id: int, username: str) -> Token:
+    data = {"sub": username}
+    if SIGNED_CLAIMS:
+        data["uid"] = user_id
+    access_token = create_access_token(
+        data=data,
+        expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    )
+    return Token(access_token=access_token, token_type="bearer")
+
 @router.post("/register", response_model=Token)
-async def register(user: UserCreate, db: Session = Depends(get_db)):
+async def register(user: UserCreate, client: Client = Depends(get_temporal_client)):
     try:
-        client = await Client.connect(os.getenv("TEMPORAL_SERVER_URL"))
         result = await client.execute_workflow(
             AuthWorkflow.run,
-            args=[db, user],
+            user.model_dump(),
             id=f"auth-workflow-{user.username}",
-            task_queue="workflow-queue"
+            task_queue=AUTH_TASK_QUEUE
         )
-        return result
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e)
         )
+    if not result["success"]:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=result["reason"]
+        )
+    return issue_token(result["user_id"], result["username"])
 
 @router.post("/login", response_model=Token)
-async def login(user: UserCreate, db: Session = Depends(get_db)):
-    try:
-        client = await Client.connect(os.getenv("TEMPORAL_SERVER_URL"))
-        result = await client.execute_workflow(
-            AuthWorkflow.run,
-            args=[db, user],
-            id=f"auth-workflow-{user.username}",
-            task_queue="workflow-queue"
+async def login(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
+    """
+    Đăng nhập trực tiếp, không qua workflow: một truy vấn theo username
+    (có index, async session nên không chặn event loop) và một lần kiểm tra
+    bcrypt trong process pool
+    """
+    db_user = await db.scalar(select(User).where(User.username == user.username))
+    if not db_user or not db_user.is_active:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Incorrect username or password"
         )
-        return result
-    except Exception as e:
+
+    valid, new_hash = await verify_and_update_password_async(user.password, db_user.hashed_password)
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password"
-        ) 
\ No newline at end of file
+        )
+
+    # Hash lại mật khẩu khi BCRYPT_ROUNDS đã thay đổi
+    if new_hash:
+        db_user.hashed_password = new_hash
+        await db.commit()
+
+    return issue_token(db_user.id, db_user.username)
+
+@router.get("/me", response_model=CurrentUser)
+async def read_current_user(current_user: CurrentUser = Depends(get_current_user)):
+    return current_user
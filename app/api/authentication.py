@@ -0,0 +1,73 @@
+import os
+import time
+from typing import Optional
+from fastapi import Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from jose import JWTError
+from app.core.cache import TTLCache
+from app.core.security import decode_access_token
+from app.db.database import SessionLocal
+from app.models.user import User
+from app.schemas.user import CurrentUser
+
+# Token đã xác thực -> người dùng, trong process. Entry hết hạn cùng token
+# (hoặc sau AUTH_TOKEN_CACHE_TTL_SECONDS nếu sớm hơn)
+AUTH_TOKEN_CACHE_SIZE = int(os.getenv("AUTH_TOKEN_CACHE_SIZE", "10000"))
+AUTH_TOKEN_CACHE_TTL = float(os.getenv("AUTH_TOKEN_CACHE_TTL_SECONDS", "300"))
+token_cache = TTLCache(maxsize=AUTH_TOKEN_CACHE_SIZE, ttl=AUTH_TOKEN_CACHE_TTL)
+
+bearer_scheme = HTTPBearer(auto_error=False)
+
+
+def _unauthorized(detail: str) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail=detail,
+        headers={"WWW-Authenticate": "Bearer"}
+    )
+
+
+def load_active_user(username: str) -> Optional[CurrentUser]:
+    with SessionLocal() as db:
+        user = db.query(User.id, User.username).filter(
+            User.username == username,
+            User.is_active == True
+        ).first()
+    return CurrentUser(id=user.id, username=user.username) if user else None
+
+
+async def get_current_user(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(bearer_scheme)
+) -> CurrentUser:
+    """
+    Người dùng của Bearer token. Token đã gặp được trả từ cache, không kiểm tra
+    lại chữ ký; token có claim "uid" (AUTH_SIGNED_CLAIMS) không cần truy vấn database.
+    """
+    if credentials is None:
+        raise _unauthorized("Not authenticated")
+    token = credentials.credentials
+
+    user = token_cache.get(token)
+    if user is not None:
+        return user
+
+    try:
+        claims = decode_access_token(token)
+    except JWTError:
+        raise _unauthorized("Could not validate credentials")
+
+    username = claims.get("sub")
+    if not username:
+        raise _unauthorized("Could not validate credentials")
+    if "uid" in claims:
+        user = CurrentUser(id=claims["uid"], username=username)
+    else:
+        user = await run_in_threadpool(load_active_user, username)
+        if user is None:
+            raise _unauthorized("Could not validate credentials")
+
+    ttl = min(claims["exp"] - time.time(), AUTH_TOKEN_CACHE_TTL) if "exp" in claims else AUTH_TOKEN_CACHE_TTL
+    if ttl > 0:
+        token_cache.set(token, user, ttl=ttl)
+    return user
@@ -0,0 +1,49 @@
+import datetime
+import hashlib
+from email.utils import format_datetime
+from typing import Any, Dict, Optional
+from fastapi import Request, Response
+from app.api.serialization import dump_json
+
+
+def cache_entry(content: Any, last_modified: Optional[datetime.datetime], headers: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    """
+    Serialize response một lần để lưu cache. ETag là hash của body nên đổi theo
+    mọi thay đổi (kể cả updated_at), Last-Modified lấy từ updated_at.
+    """
+    body = dump_json(content)
+    entry = {
+        # Lưu dạng str để entry serialize được khi dùng cache chung (Redis)
+        "body": body.decode(),
+        "etag": '"' + hashlib.sha1(body).hexdigest() + '"',
+        "headers": headers or {},
+        "last_modified": None,
+    }
+    if last_modified is not None:
+        # updated_at lưu theo UTC, không có timezone
+        if last_modified.tzinfo is None:
+            last_modified = last_modified.replace(tzinfo=datetime.timezone.utc)
+        entry["last_modified"] = format_datetime(last_modified, usegmt=True)
+    return entry
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # So sánh yếu (weak comparison) theo RFC 9110 cho If-None-Match
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return etag in candidates
+
+
+def conditional_response(request: Request, entry: Dict[str, Any]) -> Response:
+    """
+    Trả body đã serialize từ cache, hoặc 304 Not Modified khi If-None-Match khớp ETag
+    """
+    headers = {"ETag": entry["etag"], **entry["headers"]}
+    if entry["last_modified"]:
+        headers["Last-Modified"] = entry["last_modified"]
+    if etag_matches(request.headers.get("if-none-match"), entry["etag"]):
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry["body"], media_type="application/json", headers=headers)
@@ -0,0 +1,69 @@
+import csv
+import datetime
+import enum
+import io
+import os
+from typing import Any, Iterator
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Select
+from app.api.serialization import dump_json
+from app.db.database import SessionLocal
+
+# Số dòng mỗi lần lấy từ server-side cursor, cũng là số dòng mỗi chunk gửi đi
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+
+class ExportFormat(str, enum.Enum):
+    NDJSON = "ndjson"
+    CSV = "csv"
+
+
+EXPORT_MEDIA_TYPES = {
+    ExportFormat.NDJSON: "application/x-ndjson",
+    ExportFormat.CSV: "text/csv; charset=utf-8",
+}
+
+
+def _csv_value(value: Any) -> Any:
+    # datetime ghi theo ISO 8601 giống NDJSON
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    return value
+
+
+def stream_rows(statement: Select, export_format: ExportFormat) -> Iterator[bytes]:
+    """
+    Đọc kết quả qua server-side cursor (yield_per -> stream_results) và gửi từng lô
+    ngay khi lấy được, nên bộ nhớ không phụ thuộc số dòng và byte đầu tiên đi ra
+    trước khi query đọc xong.
+
+    Session được mở trong generator: dependency get_db đã đóng session trước khi
+    StreamingResponse bắt đầu gửi body.
+    """
+    with SessionLocal() as db:
+        result = db.execute(statement.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        if export_format == ExportFormat.CSV:
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(result.keys())
+            yield buffer.getvalue().encode()
+            for rows in result.partitions():
+                buffer.seek(0)
+                buffer.truncate()
+                writer.writerows([_csv_value(value) for value in row] for row in rows)
+                yield buffer.getvalue().encode()
+        else:
+            for rows in result.partitions():
+                yield b"".join(dump_json(row._asdict()) + b"\n" for row in rows)
+
+
+def export_response(statement: Select, export_format: ExportFormat, filename: str) -> StreamingResponse:
+    """
+    StreamingResponse với generator đồng bộ: Starlette chạy từng bước trên threadpool,
+    không chặn event loop khi chờ database
+    """
+    return StreamingResponse(
+        stream_rows(statement, export_format),
+        media_type=EXPORT_MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{export_format.value}"'}
+    )
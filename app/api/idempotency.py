@@ -0,0 +1,302 @@
+import asyncio
+import datetime
+import hashlib
+import json
+import os
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy import delete, update
+from sqlalchemy.exc import IntegrityError
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers
+from app.api.serialization import dump_json
+from app.db.database import SessionLocal
+from app.models.idempotency import IdempotencyKey, IdempotencyStatus
+
+# Response đã lưu được trả lại trong IDEMPOTENCY_TTL_SECONDS
+IDEMPOTENCY_TTL = datetime.timedelta(seconds=int(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400")))
+# Khoá của request đang chạy hết hạn sau thời gian này nếu không được gia hạn
+# (process chạy request bị chết); request đang chạy gia hạn khoá mỗi 1/3 khoảng này
+IDEMPOTENCY_LOCK_TTL = datetime.timedelta(seconds=int(os.getenv("IDEMPOTENCY_LOCK_SECONDS", "60")))
+# Thời gian chờ request trùng đang chạy ở process khác trước khi trả 409
+IDEMPOTENCY_WAIT_SECONDS = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", "10"))
+
+MUTATING_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+
+# Response đã lưu: (status, headers, body)
+StoredResponse = Tuple[int, List[List[str]], bytes]
+
+
+def _claim(key: str, token: str) -> Optional[Dict[str, Any]]:
+    """
+    Ghi khoá IN_PROGRESS cho key với token của request này. Trả về None nếu giành
+    được khoá (request được thực thi), nếu không thì trả về dòng hiện có.
+    """
+    now = datetime.datetime.utcnow()
+    with SessionLocal() as db:
+        db.execute(delete(IdempotencyKey).where(IdempotencyKey.key == key, IdempotencyKey.expires_at < now))
+        db.add(IdempotencyKey(
+            key=key,
+            status=IdempotencyStatus.IN_PROGRESS.value,
+            claim_token=token,
+            expires_at=now + IDEMPOTENCY_LOCK_TTL
+        ))
+        try:
+            db.commit()
+            return None
+        except IntegrityError:
+            db.rollback()
+        return _load(db, key)
+
+
+def _load(db, key: str) -> Optional[Dict[str, Any]]:
+    row = db.query(
+        IdempotencyKey.fingerprint,
+        IdempotencyKey.status,
+        IdempotencyKey.response_status,
+        IdempotencyKey.response_headers,
+        IdempotencyKey.response_body
+    ).filter(IdempotencyKey.key == key).first()
+    return row._asdict() if row else None
+
+
+def _get(key: str) -> Optional[Dict[str, Any]]:
+    with SessionLocal() as db:
+        return _load(db, key)
+
+
+def _owned(key: str, token: str):
+    return (IdempotencyKey.key == key) & (IdempotencyKey.claim_token == token)
+
+
+def _refresh(key: str, token: str) -> None:
+    with SessionLocal() as db:
+        db.execute(
+            update(IdempotencyKey)
+            .where(_owned(key, token), IdempotencyKey.status == IdempotencyStatus.IN_PROGRESS.value)
+            .values(expires_at=datetime.datetime.utcnow() + IDEMPOTENCY_LOCK_TTL)
+        )
+        db.commit()
+
+
+def _complete(key: str, token: str, fingerprint: str, response: StoredResponse) -> None:
+    status_code, headers, body = response
+    with SessionLocal() as db:
+        db.execute(
+            update(IdempotencyKey)
+            .where(_owned(key, token))
+            .values(
+                status=IdempotencyStatus.COMPLETED.value,
+                fingerprint=fingerprint,
+                response_status=status_code,
+                response_headers=json.dumps(headers),
+                response_body=body,
+                expires_at=datetime.datetime.utcnow() + IDEMPOTENCY_TTL
+            )
+        )
+        db.commit()
+
+
+def _release(key: str, token: str) -> None:
+    with SessionLocal() as db:
+        db.execute(delete(IdempotencyKey).where(_owned(key, token)))
+        db.commit()
+
+
+def purge_expired_idempotency_keys() -> int:
+    with SessionLocal() as db:
+        result = db.execute(delete(IdempotencyKey).where(IdempotencyKey.expires_at < datetime.datetime.utcnow()))
+        db.commit()
+        return result.rowcount
+
+
+class IdempotencyMiddleware:
+    """
+    ASGI middleware cho header Idempotency-Key trên các request POST/PUT/PATCH/DELETE.
+
+    Request đầu tiên với một key được thực thi và response (trừ lỗi 5xx) được lưu
+    vào bảng idempotency_keys; request gửi lại trong IDEMPOTENCY_TTL nhận lại đúng
+    response đó (header Idempotent-Replayed). Các request trùng đến cùng lúc trong
+    một process chờ kết quả của request đang chạy; giữa các process, request đến sau
+    chờ dòng IN_PROGRESS hoàn thành. Key dùng lại cho request khác trả 422.
+
+    Body không được giữ trong bộ nhớ: fingerprint được tính dần khi body chuyển qua
+    endpoint (upload lớn như POST /api/products/import vẫn stream được).
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._in_flight: Dict[str, asyncio.Future] = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in MUTATING_METHODS:
+            await self.app(scope, receive, send)
+            return
+        headers = Headers(scope=scope)
+        idempotency_key = headers.get("idempotency-key")
+        if not idempotency_key:
+            await self.app(scope, receive, send)
+            return
+
+        # Key chỉ có hiệu lực với cùng endpoint và cùng người gọi (Authorization)
+        key = hashlib.sha256("\n".join([
+            scope["method"], scope["path"], headers.get("authorization", ""), idempotency_key
+        ]).encode()).hexdigest()
+        # Hash của request (query, body)
+        hasher = hashlib.sha256(scope.get("query_string", b"") + b"\n")
+
+        # Request trùng trong cùng process: chờ request đang chạy
+        in_flight = self._in_flight.get(key)
+        if in_flight is not None:
+            fingerprint = await self._drain_body(receive, hasher)
+            fingerprint_in_flight, response = await asyncio.shield(in_flight)
+            if response is None:
+                await self._send_error(send, 409, "A request with this Idempotency-Key failed, retry it")
+            elif fingerprint_in_flight != fingerprint:
+                await self._send_mismatch(send)
+            else:
+                await self._replay(send, response)
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        fingerprint: Optional[str] = None
+        response: Optional[StoredResponse] = None
+        try:
+            token = uuid.uuid4().hex
+            existing = await self._claim_or_wait(key, token)
+            if existing is not None:
+                if existing["status"] != IdempotencyStatus.COMPLETED.value:
+                    await self._send_error(send, 409, "A request with this Idempotency-Key is still in progress")
+                    return
+                fingerprint = await self._drain_body(receive, hasher)
+                if existing["fingerprint"] != fingerprint:
+                    await self._send_mismatch(send)
+                else:
+                    response = (
+                        existing["response_status"],
+                        json.loads(existing["response_headers"]),
+                        existing["response_body"]
+                    )
+                    await self._replay(send, response)
+                return
+
+            fingerprint, response = await self._execute(key, token, scope, hasher, receive, send)
+        finally:
+            del self._in_flight[key]
+            future.set_result((fingerprint, response))
+
+    async def _claim_or_wait(self, key: str, token: str) -> Optional[Dict[str, Any]]:
+        """
+        None nếu request này được thực thi, nếu không thì dòng đã hoàn thành
+        (hoặc vẫn IN_PROGRESS sau IDEMPOTENCY_WAIT_SECONDS)
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + IDEMPOTENCY_WAIT_SECONDS
+        delay = 0.05
+        while True:
+            existing = await run_in_threadpool(_claim, key, token)
+            if existing is None:
+                return None
+            if existing["status"] == IdempotencyStatus.COMPLETED.value or loop.time() >= deadline:
+                return existing
+            # Request trùng đang chạy ở process khác
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.5)
+            existing = await run_in_threadpool(_get, key)
+            if existing is not None and existing["status"] == IdempotencyStatus.COMPLETED.value:
+                return existing
+
+    async def _execute(
+        self, key: str, token: str, scope, hasher, receive, send
+    ) -> Tuple[str, Optional[StoredResponse]]:
+        status_code = 500
+        response_headers: List[List[str]] = []
+        chunks: List[bytes] = []
+        body_done = False
+
+        async def hashing_receive():
+            nonlocal body_done
+            message = await receive()
+            if message["type"] == "http.request":
+                hasher.update(message.get("body", b""))
+                body_done = not message.get("more_body", False)
+            return message
+
+        async def capture_send(message):
+            nonlocal status_code, response_headers, body_done
+            if message["type"] == "http.response.start":
+                # Phần body endpoint không đọc vẫn được tính vào fingerprint,
+                # đọc trước khi response bắt đầu (sau đó server không nhận body nữa)
+                if not body_done:
+                    await self._drain_body(receive, hasher)
+                    body_done = True
+                status_code = message["status"]
+                response_headers = [[name.decode("latin-1"), value.decode("latin-1")] for name, value in message.get("headers", [])]
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+            await send(message)
+
+        # Gia hạn khoá trong khi request chạy, để request chậm hơn IDEMPOTENCY_LOCK_TTL
+        # không bị process khác thực thi lại
+        keep_claim = asyncio.create_task(self._keep_claim(key, token))
+        try:
+            await self.app(scope, hashing_receive, capture_send)
+        except BaseException:
+            keep_claim.cancel()
+            await run_in_threadpool(_release, key, token)
+            raise
+        keep_claim.cancel()
+
+        fingerprint = hasher.hexdigest()
+        # Lỗi server không được lưu để client gửi lại được thực thi lại
+        if status_code >= 500:
+            await run_in_threadpool(_release, key, token)
+            return fingerprint, None
+        response = (status_code, response_headers, b"".join(chunks))
+        await run_in_threadpool(_complete, key, token, fingerprint, response)
+        return fingerprint, response
+
+    @staticmethod
+    async def _keep_claim(key: str, token: str) -> None:
+        while True:
+            await asyncio.sleep(IDEMPOTENCY_LOCK_TTL.total_seconds() / 3)
+            try:
+                await run_in_threadpool(_refresh, key, token)
+            except Exception as e:
+                print(f"Failed to extend idempotency lock: {e}")
+
+    @staticmethod
+    async def _drain_body(receive, hasher) -> str:
+        """
+        Đọc phần body còn lại chỉ để tính hash, không giữ trong bộ nhớ
+        """
+        while True:
+            message = await receive()
+            if message["type"] != "http.request":
+                break
+            hasher.update(message.get("body", b""))
+            if not message.get("more_body", False):
+                break
+        return hasher.hexdigest()
+
+    @staticmethod
+    async def _replay(send, response: StoredResponse) -> None:
+        status_code, headers, body = response
+        raw_headers = [(name.encode("latin-1"), value.encode("latin-1")) for name, value in headers]
+        raw_headers.append((b"idempotent-replayed", b"true"))
+        await send({"type": "http.response.start", "status": status_code, "headers": raw_headers})
+        await send({"type": "http.response.body", "body": body})
+
+    @staticmethod
+    async def _send_error(send, status_code: int, detail: str) -> None:
+        body = dump_json({"detail": detail})
+        await send({
+            "type": "http.response.start",
+            "status": status_code,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    async def _send_mismatch(self, send) -> None:
+        await self._send_error(send, 422, "Idempotency-Key was already used for a different request")
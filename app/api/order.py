@@ -1,27 +1,57 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from sqlalchemy import delete, insert, select
 from sqlalchemy.orm import Session
-from typing import List
-from app.db.database import get_db
-from app.schemas.order import OrderCreate, OrderResponse, OrderUpdate
-from app.models.order import Order, OrderStatus
-from app.workflows.order_workflow import OrderWorkflow
-from temporalio.client import Client
-from dotenv import load_dotenv
+from fastapi.concurrency import run_in_threadpool
+from typing import Any, AsyncIterator, Dict, List, Optional
+import asyncio
 import os
-from uuid import uuid4
-
-load_dotenv()
+from app.db.database import SessionLocal, get_db
+from app.api.authentication import get_current_user
+from app.api.export import ExportFormat, export_response
+from app.api.pagination import keyset_paginate
+from app.api.serialization import event_stream_response, json_response, response_columns, rows_to_dicts, sse_event
+from app.schemas.order import (
+    OrderCreate,
+    OrderResponse,
+    OrderUpdate,
+    OrderBatchCreate,
+    OrderBatchItemResult,
+    OrderBatchResponse
+)
+from app.schemas.user import CurrentUser
+from app.models.order import FailureReason, Order, OrderOutbox, OrderStatus
+from app.workflows.order_workflow import OrderWorkflow, order_workflow_id
+from app.workers.client import get_temporal_client
+from app.workers.outbox import start_order_workflow
+from temporalio.client import Client, WorkflowExecutionStatus, WorkflowHandle, WorkflowQueryFailedError
+from temporalio.service import RPCError, RPCStatusCode
 
 router = APIRouter()
 
+# Chỉ SELECT các cột có trong OrderResponse
+ORDER_RESPONSE_COLUMNS = response_columns(Order, OrderResponse)
+
+# Số workflow được start đồng thời khi tạo đơn hàng hàng loạt
+BATCH_START_CONCURRENCY = int(os.getenv("ORDER_BATCH_START_CONCURRENCY", "50"))
+
+# Chu kỳ query tiến trình workflow của endpoint SSE và chu kỳ gửi keep-alive
+ORDER_EVENTS_POLL_INTERVAL = float(os.getenv("ORDER_EVENTS_POLL_INTERVAL", "0.5"))
+ORDER_EVENTS_KEEPALIVE_SECONDS = float(os.getenv("ORDER_EVENTS_KEEPALIVE_SECONDS", "15"))
+
 @router.post("", response_model=OrderResponse)
-async def create_order(order: OrderCreate, db: Session = Depends(get_db), user_id: int = 1):
+async def create_order(
+    order: OrderCreate,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user)
+):
     """
-    Tạo đơn hàng mới và bắt đầu workflow xử lý đơn hàng
+    Tạo đơn hàng mới. Đơn hàng và dòng outbox được ghi trong cùng một transaction,
+    workflow xử lý đơn hàng được start bởi OrderOutboxDispatcher nên request
+    không chờ Temporal.
     """
-    # Tạo đơn hàng mới trong database
     db_order = Order(
-        user_id=user_id,
+        user_id=current_user.id,
         product_name=order.product_name,
         quantity=order.quantity,
         price=order.price,
@@ -29,39 +59,141 @@ async def create_order(order: OrderCreate, db: Session = Depends(get_db), user_i
         shipping_address=order.shipping_address,
         status=OrderStatus.RECEIVED
     )
+    # Session đồng bộ: ghi database trong threadpool để không chặn event loop
+    response = await run_in_threadpool(insert_order, db, db_order)
+
+    # Đánh thức dispatcher trong process (nếu có) để workflow được start ngay
+    dispatcher = getattr(request.app.state, "outbox", None)
+    if dispatcher is not None:
+        dispatcher.notify()
+    return response
+
+def insert_order(db: Session, db_order: Order) -> OrderResponse:
     db.add(db_order)
+    db.flush()
+    db.add(OrderOutbox(order_id=db_order.id))
+    # Đọc response trước khi commit để không phải refresh lại dòng vừa ghi
+    response = OrderResponse.model_validate(db_order)
     db.commit()
-    db.refresh(db_order)
-    
-    # Bắt đầu workflow xử lý đơn hàng
-    try:
-        client = await Client.connect(os.getenv("TEMPORAL_SERVER_URL"))
-        # Ghi chú: Workflow được thực thi không đồng bộ
-        await client.start_workflow(
-            OrderWorkflow.run,
-            args=[db_order.id],
-            id=f"order-workflow-{db_order.id}-{uuid4()}",
-            task_queue="workflow-queue"
-        )
-        return OrderResponse.model_validate(db_order)
-    except Exception as e:
-        # Trong trường hợp lỗi, đánh dấu đơn hàng thất bại
-        db_order.status = OrderStatus.FAILED
-        db.commit()
-        db.refresh(db_order)
-        
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to start order workflow: {str(e)}"
+    return response
+
+@router.post("/batch", response_model=OrderBatchResponse)
+async def create_orders_batch(
+    batch: OrderBatchCreate,
+    request: Request,
+    db: Session = Depends(get_db),
+    client: Client = Depends(get_temporal_client),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    """
+    Tạo nhiều đơn hàng bằng một câu INSERT nhiều dòng, ghi outbox trong cùng
+    transaction, rồi start các workflow ngay với số lượng đồng thời giới hạn.
+    Đơn hàng không start được (hoặc process chết trước khi start) vẫn còn trong
+    outbox và được OrderOutboxDispatcher start lại.
+    """
+    rows = [
+        {
+            "user_id": current_user.id,
+            "product_name": order.product_name,
+            "quantity": order.quantity,
+            "price": order.price,
+            "total_amount": order.quantity * order.price,
+            "shipping_address": order.shipping_address,
+            "status": OrderStatus.RECEIVED.value,
+        }
+        for order in batch.orders
+    ]
+    # Session đồng bộ: các câu lệnh database chạy trong threadpool để không chặn event loop
+    order_ids = await run_in_threadpool(insert_orders, db, rows)
+
+    semaphore = asyncio.Semaphore(BATCH_START_CONCURRENCY)
+
+    async def start(index: int, order_id: int) -> OrderBatchItemResult:
+        async with semaphore:
+            error = await start_order_workflow(client, order_id)
+        return OrderBatchItemResult(
+            index=index,
+            order_id=order_id,
+            status=OrderStatus.RECEIVED,
+            workflow_id=order_workflow_id(order_id),
+            error=f"{error}; retried from the order outbox" if error else None
         )
 
+    results = await asyncio.gather(*(start(i, order_id) for i, order_id in enumerate(order_ids)))
+
+    # Workflow đã start thì không cần dòng outbox nữa
+    started_ids = [r.order_id for r in results if r.error is None]
+    if started_ids:
+        await run_in_threadpool(delete_outbox_rows, db, started_ids)
+    deferred = len(results) - len(started_ids)
+    dispatcher = getattr(request.app.state, "outbox", None)
+    if deferred and dispatcher is not None:
+        dispatcher.notify()
+
+    return OrderBatchResponse(
+        total=len(results),
+        started=len(started_ids),
+        failed=deferred,
+        results=results
+    )
+
+def insert_orders(db: Session, rows: List[Dict[str, Any]]) -> List[int]:
+    order_ids = db.scalars(
+        insert(Order).returning(Order.id, sort_by_parameter_order=True),
+        rows
+    ).all()
+    db.execute(insert(OrderOutbox), [{"order_id": order_id} for order_id in order_ids])
+    db.commit()
+    return order_ids
+
+def delete_outbox_rows(db: Session, order_ids: List[int]) -> None:
+    db.execute(delete(OrderOutbox).where(OrderOutbox.order_id.in_(order_ids)))
+    db.commit()
+
+
 @router.get("", response_model=List[OrderResponse])
-async def get_orders(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+def get_orders(
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=500),
+    status_filter: Optional[OrderStatus] = Query(None, alias="status"),
+    user_id: Optional[int] = None,
+    db: Session = Depends(get_db)
+):
     """
-    Lấy danh sách đơn hàng
+    Lấy danh sách đơn hàng, phân trang theo cursor.
+    Cursor của trang tiếp theo được trả về trong header X-Next-Cursor.
+    Chỉ đọc các cột của response và serialize thẳng sang JSON, không tạo ORM object
+    hay validate từng dòng qua OrderResponse.
     """
-    orders = db.query(Order).offset(skip).limit(limit).all()
-    return orders
+    query = filter_orders(db.query(*ORDER_RESPONSE_COLUMNS), status_filter, user_id)
+    orders, next_cursor = keyset_paginate(query, Order.id, cursor, limit)
+    return json_response(
+        rows_to_dicts(orders),
+        headers={"X-Next-Cursor": next_cursor} if next_cursor else None
+    )
+
+@router.get("/export", response_model=None)
+def export_orders(
+    export_format: ExportFormat = Query(ExportFormat.NDJSON, alias="format"),
+    status_filter: Optional[OrderStatus] = Query(None, alias="status"),
+    user_id: Optional[int] = None
+):
+    """
+    Xuất toàn bộ đơn hàng (cùng bộ lọc với danh sách) dạng NDJSON hoặc CSV,
+    stream theo thứ tự id qua server-side cursor
+    """
+    statement = filter_orders(select(*ORDER_RESPONSE_COLUMNS), status_filter, user_id)
+    return export_response(statement.order_by(Order.id), export_format, "orders")
+
+def filter_orders(query, status_filter: Optional[OrderStatus], user_id: Optional[int]):
+    """
+    Bộ lọc chung cho danh sách và export, áp dụng được cho cả Query lẫn Select
+    """
+    if status_filter is not None:
+        query = query.filter(Order.status == status_filter.value)
+    if user_id is not None:
+        query = query.filter(Order.user_id == user_id)
+    return query
 
 @router.get("/{order_id}", response_model=OrderResponse)
 async def get_order(order_id: int, db: Session = Depends(get_db)):
@@ -74,4 +206,80 @@ async def get_order(order_id: int, db: Session = Depends(get_db)):
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Order not found"
         )
-    return order 
\ No newline at end of file
+    return order 
+
+@router.get("/{order_id}/events", response_model=None)
+async def get_order_events(order_id: int, client: Client = Depends(get_temporal_client)):
+    """
+    Server-Sent Events: gửi trạng thái đơn hàng mỗi khi workflow chuyển bước.
+    Tiến trình được đọc qua query get_progress của workflow, không chạm database;
+    workflow đã kết thúc (hoặc không còn trên Temporal) thì trả trạng thái cuối từ database.
+    """
+    handle = client.get_workflow_handle(order_workflow_id(order_id))
+    try:
+        description = await handle.describe()
+        running = description.status == WorkflowExecutionStatus.RUNNING
+    except RPCError as e:
+        if e.status != RPCStatusCode.NOT_FOUND:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail=f"Temporal server unavailable: {str(e)}"
+            )
+        running = False
+
+    if running:
+        return event_stream_response(stream_order_progress(handle, order_id))
+
+    progress = await run_in_threadpool(load_order_progress, order_id)
+    if progress is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Order not found"
+        )
+    return event_stream_response(single_event(progress))
+
+async def stream_order_progress(handle: WorkflowHandle, order_id: int) -> AsyncIterator[bytes]:
+    last_progress = None
+    idle = 0.0
+    while True:
+        try:
+            progress = await handle.query(OrderWorkflow.get_progress)
+        except (RPCError, WorkflowQueryFailedError):
+            # Workflow đã đóng giữa hai lần query: trạng thái cuối lấy từ database
+            progress = await run_in_threadpool(load_order_progress, order_id)
+            if progress is not None:
+                yield sse_event("progress", progress)
+            return
+
+        if progress != last_progress:
+            yield sse_event("progress", progress)
+            last_progress = progress
+            idle = 0.0
+            if progress["done"]:
+                return
+        elif idle >= ORDER_EVENTS_KEEPALIVE_SECONDS:
+            # Comment SSE giữ kết nối qua proxy khi workflow chờ lâu ở một bước
+            yield b": keep-alive\n\n"
+            idle = 0.0
+
+        await asyncio.sleep(ORDER_EVENTS_POLL_INTERVAL)
+        idle += ORDER_EVENTS_POLL_INTERVAL
+
+async def single_event(progress: Dict[str, Any]) -> AsyncIterator[bytes]:
+    yield sse_event("progress", progress)
+
+def load_order_progress(order_id: int) -> Optional[Dict[str, Any]]:
+    """
+    Trạng thái đơn hàng từ database, cùng dạng với query get_progress của workflow
+    """
+    with SessionLocal() as db:
+        order = db.query(Order.id, Order.status, Order.failure_reason).filter(Order.id == order_id).first()
+    if order is None:
+        return None
+    return {
+        "order_id": order.id,
+        "status": order.status,
+        "failure_reason": None if order.failure_reason == FailureReason.NONE.value else order.failure_reason,
+        "steps": [],
+        "done": order.status in (OrderStatus.COMPLETED.value, OrderStatus.FAILED.value),
+    }
@@ -0,0 +1,60 @@
+import base64
+import json
+from typing import Any, Dict, List, Optional, Tuple
+from fastapi import HTTPException, Response, status
+from sqlalchemy.orm import Query
+
+
+def encode_cursor(values: Dict[str, Any]) -> str:
+    """
+    Mã hoá vị trí trang tiếp theo thành chuỗi cursor mờ (opaque)
+    """
+    raw = json.dumps(values, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Dict[str, Any]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(values, dict):
+            raise ValueError("cursor must encode an object")
+        return values
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+
+def keyset_paginate(query: Query, id_column, cursor: Optional[str], limit: int) -> Tuple[List[Any], Optional[str]]:
+    """
+    Phân trang theo khoá (keyset) trên cột id: WHERE id > :last_id ORDER BY id LIMIT n.
+
+    Chi phí mỗi trang không phụ thuộc vào vị trí trang, khác với OFFSET.
+    Trả về các dòng của trang và cursor của trang tiếp theo (None nếu là trang cuối).
+    """
+    if cursor:
+        last_id = decode_cursor(cursor).get("id")
+        if not isinstance(last_id, int):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid cursor"
+            )
+        query = query.filter(id_column > last_id)
+
+    # Lấy thêm một dòng để biết còn trang tiếp theo hay không
+    rows = query.order_by(id_column).limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor({"id": rows[-1].id})
+    return rows, next_cursor
+
+
+def set_next_cursor(response: Response, next_cursor: Optional[str]) -> None:
+    """
+    Trả cursor trang tiếp theo qua header để giữ nguyên body dạng danh sách
+    """
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
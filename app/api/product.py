@@ -1,36 +1,68 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy import func, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import List
+from starlette.concurrency import run_in_threadpool
+from typing import Any, Dict, List, Optional
 import asyncio
+import json
+import os
+import tempfile
 
-from app.db.database import get_db
-from app.models.product import Product, ProductCategory
+from app.db.database import get_async_db, get_db
+from app.db import product_import
+from app.db.inventory import PRODUCT_NOT_FOUND
+from app.api.pagination import decode_cursor, encode_cursor, keyset_paginate, set_next_cursor
+from app.api.caching import cache_entry, conditional_response
+from app.api.export import ExportFormat, export_response
+from app.api.serialization import response_columns, rows_to_dicts
+from app.db.product_cache import (
+    low_stock_cache,
+    product_cache,
+    product_list_cache,
+    invalidate_products,
+    mark_products_changed
+)
+from app.models.product import Product, ProductCategory, ProductImport, ProductImportStatus
 from app.schemas.product import (
     ProductCreate, 
     ProductUpdate, 
     ProductResponse, 
     ProductStockUpdate,
-    LowStockReport
+    LowStockReport,
+    ProductImportResponse
 )
 from app.workflows.product_workflow import (
     ProductCreateWorkflow,
-    ProductStockUpdateWorkflow,
-    ProductInventoryCheckWorkflow
+    ProductImportWorkflow,
+    ProductInventoryWorkflow
 )
-from app.workers.client import get_client
+from app.workers.client import PRODUCT_TASK_QUEUE, get_temporal_client
+from temporalio.client import Client, WorkflowHandle
+from uuid import uuid4
 
 router = APIRouter(tags=["products"])
 
+# Chỉ SELECT các cột có trong ProductResponse
+PRODUCT_RESPONSE_COLUMNS = response_columns(Product, ProductResponse)
+
+# Kích thước mỗi lần ghi body upload ra file tạm
+UPLOAD_WRITE_SIZE = 1024 * 1024
+
 @router.post("/products", response_model=ProductResponse, status_code=status.HTTP_201_CREATED)
-async def create_product(product: ProductCreate, db: Session = Depends(get_db)):
-    client = await get_client()
-    
+async def create_product(
+    product: ProductCreate,
+    db: AsyncSession = Depends(get_async_db),
+    client: Client = Depends(get_temporal_client)
+):
     # Tạo workflow
     result = await client.execute_workflow(
         ProductCreateWorkflow.run,
         product.model_dump(),
-        id=f"product-create-{product.name}",
-        task_queue="workflow-queue"
+        # ID riêng cho mỗi request: hai request khác nhau cùng tên không dùng chung workflow,
+        # request gửi lại được loại trùng bằng header Idempotency-Key
+        id=f"product-create-{uuid4()}",
+        task_queue=PRODUCT_TASK_QUEUE
     )
     
     if not result["success"]:
@@ -39,38 +71,226 @@ async def create_product(product: ProductCreate, db: Session = Depends(get_db)):
             detail=result["reason"]
         )
     
-    # Lấy sản phẩm từ database
-    db_product = db.query(Product).filter(Product.id == result["product_id"]).first()
+    # Lấy sản phẩm từ database (async session, không chặn event loop)
+    db_product = await db.get(Product, result["product_id"])
+    # Activity chạy ở worker nên cache trong process của API phải xoá tại đây
+    invalidate_products([result["product_id"]])
     return db_product
 
 @router.get("/products", response_model=List[ProductResponse])
-def get_products(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    products = db.query(Product).offset(skip).limit(limit).all()
-    return products
+def get_products(
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=500),
+    category: Optional[ProductCategory] = None,
+    is_active: Optional[bool] = None,
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    db: Session = Depends(get_db)
+):
+    # Trang đã serialize được cache theo tham số, bị xoá khi có sản phẩm thay đổi
+    key = (cursor, limit, category.value if category else None, is_active, min_price, max_price)
+    entry = product_list_cache.get(key)
+    if entry is None:
+        query = filter_products(
+            db.query(*PRODUCT_RESPONSE_COLUMNS), category, is_active, min_price, max_price
+        )
 
-@router.get("/products/low-stock", response_model=LowStockReport)
-async def get_low_stock_products(threshold: int = 10):
-    client = await get_client()
-    
-    # Chạy kiểm tra tồn kho thấp
-    result = await client.execute_workflow(
-        ProductInventoryCheckWorkflow.run,
-        threshold,
-        id="product-low-stock-check",
-        task_queue="workflow-queue"
+        # Phân trang theo cursor, cursor trang tiếp theo nằm trong header X-Next-Cursor
+        products, next_cursor = keyset_paginate(query, Product.id, cursor, limit)
+        entry = cache_entry(
+            rows_to_dicts(products),
+            max((product.updated_at for product in products), default=None),
+            headers={"X-Next-Cursor": next_cursor} if next_cursor else None
+        )
+        product_list_cache.set(key, entry)
+    return conditional_response(request, entry)
+
+@router.get("/products/export", response_model=None)
+def export_products(
+    export_format: ExportFormat = Query(ExportFormat.NDJSON, alias="format"),
+    category: Optional[ProductCategory] = None,
+    is_active: Optional[bool] = None,
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0)
+):
+    """
+    Xuất toàn bộ sản phẩm (cùng bộ lọc với danh sách) dạng NDJSON hoặc CSV,
+    stream theo thứ tự id qua server-side cursor, không đi qua cache
+    """
+    statement = filter_products(
+        select(*PRODUCT_RESPONSE_COLUMNS), category, is_active, min_price, max_price
     )
-    
+    return export_response(statement.order_by(Product.id), export_format, "products")
+
+@router.post("/products/import", response_model=ProductImportResponse, status_code=status.HTTP_202_ACCEPTED)
+async def import_products(
+    request: Request,
+    import_format: ExportFormat = Query(ExportFormat.NDJSON, alias="format"),
+    db: Session = Depends(get_db),
+    client: Client = Depends(get_temporal_client)
+):
+    """
+    Import sản phẩm hàng loạt từ body dạng NDJSON hoặc CSV (cùng cột với export).
+    Body được stream ra file tạm, validate từng dòng thành các chunk lưu trong database,
+    sau đó ProductImportWorkflow ghi từng chunk bằng COPY; theo dõi qua GET /products/import/{import_id}
+    """
+    import_id = uuid4().hex
+    fd, upload_path = tempfile.mkstemp(prefix="product-import-", suffix=f".{import_format.value}")
+    try:
+        # Không giữ cả file trong bộ nhớ; ghi file theo lô UPLOAD_WRITE_SIZE trong threadpool
+        with os.fdopen(fd, "wb") as f:
+            buffer = bytearray()
+            async for chunk in request.stream():
+                buffer += chunk
+                if len(buffer) >= UPLOAD_WRITE_SIZE:
+                    await run_in_threadpool(f.write, bytes(buffer))
+                    buffer.clear()
+            if buffer:
+                await run_in_threadpool(f.write, bytes(buffer))
+        staged = await run_in_threadpool(product_import.stage_import, upload_path, import_format.value, import_id)
+    except Exception:
+        # Không để lại các chunk đã commit của lần import hỏng
+        await run_in_threadpool(product_import.discard_import_chunks, import_id)
+        raise
+    finally:
+        os.remove(upload_path)
+
+    job = ProductImport(
+        id=import_id,
+        status=ProductImportStatus.PENDING.value,
+        total_rows=staged["total_rows"],
+        invalid_rows=staged["invalid_rows"],
+        total_chunks=staged["total_chunks"],
+        committed_chunks=0,
+        imported_rows=0,
+        errors=json.dumps(staged["errors"])
+    )
+    # Session đồng bộ: ghi database trong threadpool để không chặn event loop
+    response = await run_in_threadpool(save_import, db, job)
+
+    try:
+        await client.start_workflow(
+            ProductImportWorkflow.run,
+            import_id,
+            id=f"product-import-{import_id}",
+            task_queue=PRODUCT_TASK_QUEUE
+        )
+    except Exception:
+        job.status = ProductImportStatus.FAILED.value
+        await run_in_threadpool(save_import, db, job)
+        await run_in_threadpool(product_import.discard_import_chunks, import_id)
+        raise
+    return response
+
+def save_import(db: Session, job: ProductImport) -> Dict[str, Any]:
+    db.add(job)
+    db.commit()
+    # Đọc lại các cột sau commit ngay trong thread này
+    return import_response(job)
+
+@router.get("/products/import/{import_id}", response_model=ProductImportResponse)
+def get_product_import(import_id: str, db: Session = Depends(get_db)):
+    job = db.query(ProductImport).filter(ProductImport.id == import_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Lần import không tồn tại")
+    return import_response(job)
+
+def import_response(job: ProductImport) -> Dict[str, Any]:
     return {
-        "low_stock_count": result["low_stock_count"],
-        "products": result["products"]
+        "import_id": job.id,
+        "status": job.status,
+        "total_rows": job.total_rows,
+        "invalid_rows": job.invalid_rows,
+        "total_chunks": job.total_chunks,
+        "committed_chunks": job.committed_chunks,
+        "imported_rows": job.imported_rows,
+        "errors": json.loads(job.errors) if job.errors else [],
+    }
+
+def filter_products(
+    query,
+    category: Optional[ProductCategory],
+    is_active: Optional[bool],
+    min_price: Optional[float],
+    max_price: Optional[float]
+):
+    """
+    Bộ lọc chung cho danh sách và export, áp dụng được cho cả Query lẫn Select
+    """
+    if category is not None:
+        query = query.filter(Product.category == category.value)
+    if is_active is not None:
+        query = query.filter(Product.is_active == is_active)
+    if min_price is not None:
+        query = query.filter(Product.price >= min_price)
+    if max_price is not None:
+        query = query.filter(Product.price <= max_price)
+    return query
+
+@router.get("/products/low-stock", response_model=LowStockReport)
+def get_low_stock_products(
+    response: Response,
+    threshold: int = 10,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db)
+):
+    """
+    Báo cáo sản phẩm tồn kho thấp, đọc từ partial index ix_products_active_low_stock
+    và phân trang theo (stock_quantity, id). Kết quả được cache theo threshold,
+    cache bị bỏ qua khi dữ liệu sản phẩm thay đổi (max(updated_at) khác đi).
+    """
+    # Phiên bản dạng chuỗi để entry serialize được khi dùng cache chung (Redis)
+    version = str(db.query(func.max(Product.updated_at)).scalar())
+    key = (threshold, cursor, limit)
+    cached = low_stock_cache.get(key)
+    if cached is None or cached[0] != version:
+        cached = [version, *build_low_stock_page(db, threshold, cursor, limit)]
+        low_stock_cache.set(key, cached)
+
+    _, report, next_cursor = cached
+    set_next_cursor(response, next_cursor)
+    return report
+
+def build_low_stock_page(db: Session, threshold: int, cursor: Optional[str], limit: int):
+    condition = (Product.stock_quantity < threshold) & (Product.is_active == True)
+    low_stock_count = db.query(func.count(Product.id)).filter(condition).scalar()
+
+    query = db.query(Product.id, Product.name, Product.stock_quantity).filter(condition)
+    if cursor:
+        position = decode_cursor(cursor)
+        if not isinstance(position.get("stock"), int) or not isinstance(position.get("id"), int):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+        query = query.filter(
+            tuple_(Product.stock_quantity, Product.id) > tuple_(position["stock"], position["id"])
+        )
+
+    rows = query.order_by(Product.stock_quantity, Product.id).limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor({"stock": rows[-1].stock_quantity, "id": rows[-1].id})
+
+    report = {
+        "low_stock_count": low_stock_count,
+        "products": [
+            {"id": row.id, "name": row.name, "current_stock": row.stock_quantity}
+            for row in rows
+        ]
     }
+    return report, next_cursor
 
 @router.get("/products/{product_id}", response_model=ProductResponse)
-def get_product(product_id: int, db: Session = Depends(get_db)):
-    product = db.query(Product).filter(Product.id == product_id).first()
-    if not product:
-        raise HTTPException(status_code=404, detail="Sản phẩm không tồn tại")
-    return product
+def get_product(product_id: int, request: Request, db: Session = Depends(get_db)):
+    entry = product_cache.get(product_id)
+    if entry is None:
+        product = db.query(*PRODUCT_RESPONSE_COLUMNS).filter(Product.id == product_id).first()
+        if not product:
+            raise HTTPException(status_code=404, detail="Sản phẩm không tồn tại")
+        entry = cache_entry(product._asdict(), product.updated_at)
+        product_cache.set(product_id, entry)
+    return conditional_response(request, entry)
 
 @router.put("/products/{product_id}", response_model=ProductResponse)
 def update_product(product_id: int, product_update: ProductUpdate, db: Session = Depends(get_db)):
@@ -83,6 +303,7 @@ def update_product(product_id: int, product_update: ProductUpdate, db: Session =
     for key, value in update_data.items():
         setattr(db_product, key, value)
     
+    mark_products_changed(db, [product_id])
     db.commit()
     db.refresh(db_product)
     return db_product
@@ -91,25 +312,50 @@ def update_product(product_id: int, product_update: ProductUpdate, db: Session =
 async def update_product_stock(
     product_id: int, 
     stock_update: ProductStockUpdate, 
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db),
+    client: Client = Depends(get_temporal_client)
 ):
-    client = await get_client()
-    
-    # Cập nhật tồn kho thông qua workflow
-    result = await client.execute_workflow(
-        ProductStockUpdateWorkflow.run,
-        product_id,
-        stock_update.quantity_change,
-        id=f"product-stock-update-{product_id}",
-        task_queue="workflow-queue"
+    # Không SELECT trước: activity của workflow thực thể đã trả về "Product not found"
+    # Gửi thay đổi tồn kho tới workflow thực thể của sản phẩm (signal-with-start),
+    # các thay đổi đồng thời được gộp thành một lần ghi database
+    request_id = str(uuid4())
+    handle = await client.start_workflow(
+        ProductInventoryWorkflow.run,
+        args=[product_id],
+        id=f"product-inventory-{product_id}",
+        task_queue=PRODUCT_TASK_QUEUE,
+        start_signal="adjust_stock",
+        start_signal_args=[request_id, stock_update.quantity_change]
     )
+    result = await wait_for_stock_adjustment(handle, request_id)
     
     if not result["success"]:
+        if result["reason"] == PRODUCT_NOT_FOUND:
+            raise HTTPException(status_code=404, detail="Sản phẩm không tồn tại")
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=result["reason"]
         )
     
     # Lấy sản phẩm từ database
-    db_product = db.query(Product).filter(Product.id == product_id).first()
-    return db_product 
\ No newline at end of file
+    invalidate_products([product_id])
+    return await db.get(Product, product_id)
+
+async def wait_for_stock_adjustment(handle: WorkflowHandle, request_id: str, timeout: float = 10.0) -> Dict[str, Any]:
+    """
+    Chờ workflow thực thể ghi thay đổi tồn kho xuống database
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    delay = 0.02
+    while True:
+        result = await handle.query(ProductInventoryWorkflow.get_adjustment, request_id)
+        if result is not None:
+            return result
+        if loop.time() >= deadline:
+            raise HTTPException(
+                status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+                detail="Stock update is still pending"
+            )
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, 0.2)
@@ -0,0 +1,42 @@
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional
+import orjson
+from fastapi import Response
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+
+def response_columns(model, schema: type[BaseModel]) -> List[Any]:
+    """
+    Các cột của model tương ứng với field của response schema, dùng cho
+    query projection (chỉ SELECT các cột cần trả về)
+    """
+    return [getattr(model, name) for name in schema.model_fields]
+
+
+def rows_to_dicts(rows: Iterable[Any]) -> List[Dict[str, Any]]:
+    return [row._asdict() for row in rows]
+
+
+def dump_json(content: Any) -> bytes:
+    """
+    Serialize thẳng sang JSON bytes bằng orjson, không validate qua pydantic từng dòng.
+    datetime được ghi theo ISO 8601 giống pydantic.
+    """
+    return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+def json_response(content: Any, headers: Optional[Dict[str, str]] = None) -> Response:
+    return Response(content=dump_json(content), media_type="application/json", headers=headers)
+
+
+def sse_event(event: str, data: Any) -> bytes:
+    return b"event: " + event.encode() + b"\ndata: " + dump_json(data) + b"\n\n"
+
+
+def event_stream_response(events: AsyncIterator[bytes]) -> StreamingResponse:
+    # X-Accel-Buffering: no để nginx không giữ lại các event
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -0,0 +1,106 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+
+class TTLCache:
+    """
+    Cache LRU trong process, mỗi entry hết hạn sau ``ttl`` giây.
+    An toàn khi dùng từ nhiều thread (endpoint sync của FastAPI chạy trong threadpool).
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+class RedisCache:
+    """
+    Cache dùng chung giữa các process (API, worker) trên Redis, cùng interface với TTLCache.
+    Giá trị phải serialize được bằng JSON. Lỗi kết nối Redis được coi như cache miss.
+    """
+
+    def __init__(self, url: str, namespace: str, ttl: float = 60.0):
+        # redis là dependency tuỳ chọn, chỉ cần khi cấu hình CACHE_URL
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("CACHE_URL yêu cầu package redis (pip install redis)")
+        self._errors = redis.RedisError
+        self._redis = redis.Redis.from_url(url)
+        self.namespace = namespace
+        self.ttl = ttl
+
+    def _key(self, key: Hashable) -> str:
+        # clear() tăng generation của namespace thay vì xoá từng key,
+        # key của generation cũ tự hết hạn theo TTL
+        generation = int(self._redis.get(f"{self.namespace}:generation") or 0)
+        return f"{self.namespace}:{generation}:{key!r}"
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        try:
+            raw = self._redis.get(self._key(key))
+        except self._errors as e:
+            print(f"Cache {self.namespace} get failed: {e}")
+            return None
+        return None if raw is None else json.loads(raw)
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        try:
+            self._redis.set(self._key(key), json.dumps(value), px=int((self.ttl if ttl is None else ttl) * 1000))
+        except self._errors as e:
+            print(f"Cache {self.namespace} set failed: {e}")
+
+    def delete(self, key: Hashable) -> None:
+        try:
+            self._redis.delete(self._key(key))
+        except self._errors as e:
+            print(f"Cache {self.namespace} delete failed: {e}")
+
+    def clear(self) -> None:
+        try:
+            self._redis.incr(f"{self.namespace}:generation")
+        except self._errors as e:
+            print(f"Cache {self.namespace} clear failed: {e}")
+
+
+def create_cache(namespace: str, maxsize: int = 1024, ttl: float = 60.0):
+    """
+    Cache trong process (TTLCache), hoặc RedisCache dùng chung khi cấu hình CACHE_URL
+    """
+    url = os.getenv("CACHE_URL")
+    if url:
+        return RedisCache(url, namespace, ttl)
+    return TTLCache(maxsize, ttl)
@@ -0,0 +1,133 @@
+import asyncio
+import dataclasses
+import hashlib
+import os
+import zlib
+from pathlib import Path
+from typing import Iterable, List, Optional
+from urllib.parse import urlparse
+import temporalio.converter
+from temporalio.api.common.v1 import Payload
+from temporalio.converter import DataConverter, PayloadCodec
+
+# Payload lớn hơn ngưỡng này được nén; lớn hơn ngưỡng claim-check (sau khi nén)
+# thì lưu ra blob store, history chỉ giữ key. 0 để tắt.
+COMPRESSION_THRESHOLD = int(os.getenv("PAYLOAD_COMPRESSION_THRESHOLD", "4096"))
+CLAIM_CHECK_THRESHOLD = int(os.getenv("PAYLOAD_CLAIM_CHECK_THRESHOLD", str(256 * 1024)))
+
+ENCODING_ZLIB = b"binary/zlib"
+ENCODING_ZSTD = b"binary/zstd"
+ENCODING_CLAIM_CHECK = b"binary/claim-check"
+
+
+class LocalBlobStore:
+    """
+    Blob store trên filesystem. Worker và API phải cùng thấy thư mục này
+    (cùng máy hoặc volume dùng chung).
+    """
+
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / key
+
+    async def put(self, key: str, data: bytes) -> None:
+        await asyncio.to_thread(self._write, self._path(key), data)
+
+    async def get(self, key: str) -> bytes:
+        return await asyncio.to_thread(self._path(key).read_bytes)
+
+    @staticmethod
+    def _write(path: Path, data: bytes) -> None:
+        # Key là hash của nội dung nên blob đã có thì không cần ghi lại
+        if path.exists():
+            return
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Ghi file tạm rồi rename để bên đọc không thấy blob ghi dở
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+
+
+def create_blob_store(url: str):
+    parsed = urlparse(url)
+    if parsed.scheme == "file":
+        return LocalBlobStore(parsed.path)
+    raise ValueError(f"Blob store không được hỗ trợ: {url}")
+
+
+class LargePayloadCodec(PayloadCodec):
+    """
+    Nén payload lớn hơn compression_threshold (zstd nếu có package zstandard,
+    nếu không thì zlib) và chuyển payload vẫn lớn hơn claim_check_threshold sang
+    blob store, thay bằng payload chỉ chứa key (claim check).
+    Payload nhỏ được giữ nguyên nên history cũ vẫn decode được.
+    """
+
+    def __init__(
+        self,
+        compression_threshold: int = COMPRESSION_THRESHOLD,
+        claim_check_threshold: int = CLAIM_CHECK_THRESHOLD,
+        blob_store=None
+    ):
+        self.compression_threshold = compression_threshold
+        self.claim_check_threshold = claim_check_threshold
+        self.blob_store = blob_store
+        try:
+            # zstandard là dependency tuỳ chọn, nén nhanh hơn và tốt hơn zlib
+            import zstandard
+            self._zstd = zstandard
+        except ImportError:
+            self._zstd = None
+
+    async def encode(self, payloads: Iterable[Payload]) -> List[Payload]:
+        return [await self._encode(payload) for payload in payloads]
+
+    async def decode(self, payloads: Iterable[Payload]) -> List[Payload]:
+        return [await self._decode(payload) for payload in payloads]
+
+    async def _encode(self, payload: Payload) -> Payload:
+        if not self.compression_threshold or payload.ByteSize() < self.compression_threshold:
+            return payload
+
+        raw = payload.SerializeToString()
+        if self._zstd is not None:
+            payload = Payload(metadata={"encoding": ENCODING_ZSTD}, data=self._zstd.ZstdCompressor().compress(raw))
+        else:
+            payload = Payload(metadata={"encoding": ENCODING_ZLIB}, data=zlib.compress(raw))
+
+        if self.blob_store is not None and self.claim_check_threshold and payload.ByteSize() >= self.claim_check_threshold:
+            data = payload.SerializeToString()
+            key = hashlib.sha256(data).hexdigest()
+            await self.blob_store.put(key, data)
+            payload = Payload(metadata={"encoding": ENCODING_CLAIM_CHECK}, data=key.encode())
+        return payload
+
+    async def _decode(self, payload: Payload) -> Payload:
+        encoding = payload.metadata.get("encoding")
+        if encoding == ENCODING_CLAIM_CHECK:
+            if self.blob_store is None:
+                raise ValueError("Payload claim-check nhưng chưa cấu hình blob store")
+            payload = Payload.FromString(await self.blob_store.get(payload.data.decode()))
+            encoding = payload.metadata.get("encoding")
+
+        if encoding == ENCODING_ZSTD:
+            if self._zstd is None:
+                raise ValueError("Payload nén zstd yêu cầu package zstandard (pip install zstandard)")
+            return Payload.FromString(self._zstd.ZstdDecompressor().decompress(payload.data))
+        if encoding == ENCODING_ZLIB:
+            return Payload.FromString(zlib.decompress(payload.data))
+        return payload
+
+
+def create_data_converter(codec: Optional[PayloadCodec] = None) -> DataConverter:
+    """
+    DataConverter dùng chung cho worker và API client: hai phía phải cấu hình
+    giống nhau để đọc được payload của nhau. Claim-check chỉ bật khi đặt
+    PAYLOAD_CLAIM_CHECK_URL (blob store mà mọi worker và API cùng thấy)
+    """
+    if codec is None:
+        url = os.getenv("PAYLOAD_CLAIM_CHECK_URL")
+        codec = LargePayloadCodec(blob_store=create_blob_store(url) if url else None)
+    return dataclasses.replace(temporalio.converter.default(), payload_codec=codec)
@@ -0,0 +1,163 @@
+import time
+from contextvars import ContextVar
+from typing import Any, List, Optional
+from prometheus_client import Counter, Histogram
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from temporalio import activity
+from temporalio.runtime import PrometheusConfig, Runtime, TelemetryConfig
+from temporalio.worker import ActivityInboundInterceptor, ExecuteActivityInput, Interceptor
+
+# Metrics của API
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Độ trễ request HTTP theo route",
+    ["method", "route", "status"]
+)
+QUERIES_PER_REQUEST = Histogram(
+    "http_request_db_queries",
+    "Số câu lệnh SQL thực thi trong một request",
+    ["method", "route"],
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100)
+)
+
+# Metrics của database
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Thời gian chờ lấy connection từ pool của SQLAlchemy",
+    ["pool"],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+)
+DB_QUERIES = Counter(
+    "db_queries_total",
+    "Tổng số câu lệnh SQL đã thực thi"
+)
+
+# Metrics của worker
+ACTIVITY_DURATION = Histogram(
+    "activity_duration_seconds",
+    "Thời gian thực thi activity theo tên",
+    ["activity", "status"]
+)
+ACTIVITY_ATTEMPTS = Counter(
+    "activity_attempts_total",
+    "Số lần thực thi activity, tính cả retry",
+    ["activity"]
+)
+ACTIVITY_RETRIES = Counter(
+    "activity_retries_total",
+    "Số lần activity được thực thi lại (attempt > 1)",
+    ["activity"]
+)
+
+# Bộ đếm câu lệnh SQL của request hiện tại (danh sách một phần tử để các
+# thread trong threadpool cùng cập nhật một giá trị)
+_request_query_count: ContextVar[Optional[List[int]]] = ContextVar("request_query_count", default=None)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware ghi độ trễ và số câu lệnh SQL của mỗi request theo route
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        query_count = [0]
+        token = _request_query_count.set(query_count)
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            _request_query_count.reset(token)
+            # Dùng path template của route để tránh nhãn có cardinality cao
+            route = scope.get("route")
+            route_path = getattr(route, "path", "unmatched")
+            method = scope["method"]
+            REQUEST_LATENCY.labels(method, route_path, str(status_code)).observe(time.perf_counter() - start)
+            QUERIES_PER_REQUEST.labels(method, route_path).observe(query_count[0])
+
+
+def instrument_engine(engine: Engine) -> None:
+    """
+    Đếm câu lệnh SQL của engine (tổng và theo request)
+    """
+    @event.listens_for(engine, "before_cursor_execute")
+    def _count_query(conn, cursor, statement, parameters, context, executemany):
+        DB_QUERIES.inc()
+        query_count = _request_query_count.get()
+        if query_count is not None:
+            query_count[0] += 1
+
+
+class TimedQueuePool(QueuePool):
+    """
+    QueuePool ghi lại thời gian chờ lấy connection
+    """
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_CHECKOUT_WAIT.labels("sync").observe(time.perf_counter() - start)
+
+
+class TimedAsyncAdaptedQueuePool(AsyncAdaptedQueuePool):
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_CHECKOUT_WAIT.labels("async").observe(time.perf_counter() - start)
+
+
+class ActivityMetricsInterceptor(Interceptor):
+    """
+    Interceptor của worker ghi thời gian thực thi và số lần thử của activity
+    """
+
+    def intercept_activity(self, next: ActivityInboundInterceptor) -> ActivityInboundInterceptor:
+        return _ActivityMetricsInbound(next)
+
+
+class _ActivityMetricsInbound(ActivityInboundInterceptor):
+    async def execute_activity(self, input: ExecuteActivityInput) -> Any:
+        info = activity.info()
+        name = info.activity_type
+        ACTIVITY_ATTEMPTS.labels(name).inc()
+        if info.attempt > 1:
+            ACTIVITY_RETRIES.labels(name).inc()
+
+        start = time.perf_counter()
+        status = "failed"
+        try:
+            result = await super().execute_activity(input)
+            status = "completed"
+            return result
+        finally:
+            ACTIVITY_DURATION.labels(name, status).observe(time.perf_counter() - start)
+
+
+def create_temporal_runtime(bind_address: Optional[str]) -> Optional[Runtime]:
+    """
+    Runtime của Temporal SDK xuất metrics nội bộ (workflow end-to-end latency,
+    độ trễ poll/schedule-to-start, sticky cache, ...) dạng Prometheus tại bind_address
+    """
+    if not bind_address:
+        return None
+    return Runtime(telemetry=TelemetryConfig(metrics=PrometheusConfig(bind_address=bind_address)))
@@ -1,5 +1,8 @@
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Any, Dict, Optional, Tuple
+import multiprocessing
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from dotenv import load_dotenv
@@ -7,18 +10,82 @@ import os
 
 load_dotenv()
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Cost của bcrypt; khi thay đổi, mật khẩu cũ được hash lại ở lần đăng nhập tiếp theo
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+# Process pool riêng cho bcrypt để không chặn event loop
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 1)))
+_password_pool: Optional[ProcessPoolExecutor] = None
 
 SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = os.getenv("ALGORITHM")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES"))
 
+# Token mang sẵn id người dùng (claim "uid") để xác thực không cần truy vấn database
+SIGNED_CLAIMS = os.getenv("AUTH_SIGNED_CLAIMS", "1") != "0"
+
+def _load_signing_keys() -> Dict[str, str]:
+    """
+    Khoá ký JWT theo kid từ JWT_SIGNING_KEYS ("kid1:secret1,kid2:secret2").
+    Khoá đầu tiên ký token mới, các khoá còn lại chỉ để xác thực token đã phát
+    hành trong thời gian xoay khoá. Mặc định dùng SECRET_KEY.
+    """
+    raw = os.getenv("JWT_SIGNING_KEYS")
+    if not raw:
+        return {"default": SECRET_KEY}
+    keys = {}
+    for item in raw.split(","):
+        kid, _, secret = item.strip().partition(":")
+        keys[kid] = secret
+    return keys
+
+SIGNING_KEYS = _load_signing_keys()
+ACTIVE_KEY_ID = next(iter(SIGNING_KEYS))
+# Token không có kid (phát hành trước khi có xoay khoá) chỉ được chấp nhận khi SECRET_KEY
+# vẫn là một trong các khoá đang dùng; bỏ SECRET_KEY khỏi JWT_SIGNING_KEYS là thu hồi chúng
+LEGACY_SIGNING_KEY = SECRET_KEY if SECRET_KEY in SIGNING_KEYS.values() else None
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
+def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    Kiểm tra mật khẩu, trả về hash mới nếu hash cũ dùng cost khác BCRYPT_ROUNDS
+    """
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+def _get_password_pool() -> ProcessPoolExecutor:
+    global _password_pool
+    if _password_pool is None:
+        # spawn thay vì fork: process đang chạy event loop, Temporal runtime và các thread
+        # của threadpool/kết nối database, fork có thể sao chép khoá đang bị giữ
+        _password_pool = ProcessPoolExecutor(
+            max_workers=PASSWORD_HASH_WORKERS,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _password_pool
+
+async def get_password_hash_async(password: str) -> str:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_password_pool(), get_password_hash, password)
+
+async def verify_and_update_password_async(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _get_password_pool(), verify_and_update_password, plain_password, hashed_password
+    )
+
+def shutdown_password_pool() -> None:
+    global _password_pool
+    if _password_pool is not None:
+        _password_pool.shutdown(wait=True)
+        _password_pool = None
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     to_encode = data.copy()
     if expires_delta:
@@ -26,5 +93,23 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     else:
         expire = datetime.utcnow() + timedelta(minutes=15)
     to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt 
\ No newline at end of file
+    encoded_jwt = jwt.encode(
+        to_encode, SIGNING_KEYS[ACTIVE_KEY_ID], algorithm=ALGORITHM, headers={"kid": ACTIVE_KEY_ID}
+    )
+    return encoded_jwt
+
+def decode_access_token(token: str) -> Dict[str, Any]:
+    """
+    Kiểm tra chữ ký (khoá chọn theo kid) và hạn của token, trả về claims.
+    Token phát hành trước khi có kid được kiểm tra bằng SECRET_KEY nếu khoá này
+    vẫn nằm trong SIGNING_KEYS.
+    Raise JWTError nếu token không hợp lệ.
+    """
+    kid = jwt.get_unverified_header(token).get("kid")
+    # Header chưa được kiểm tra chữ ký: kid không phải chuỗi thì không dùng làm khoá dict
+    if kid is not None and not isinstance(kid, str):
+        raise JWTError("Invalid kid header")
+    key = SIGNING_KEYS.get(kid) if kid else LEGACY_SIGNING_KEY
+    if key is None:
+        raise JWTError("Unknown signing key")
+    return jwt.decode(token, key, algorithms=[ALGORITHM]) 
\ No newline at end of file
@@ -0,0 +1,251 @@
+import datetime
+import json
+import os
+from typing import Dict, Any, List, Optional
+from sqlalchemy import select, update, insert, delete
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.product import Product, StockDeltaBatch, StockReservation, ReservationStatus
+from app.db.product_cache import mark_products_changed
+
+# Thời gian giữ hàng mặc định cho một đơn hàng
+RESERVATION_TTL = datetime.timedelta(seconds=int(os.getenv("STOCK_RESERVATION_TTL_SECONDS", "900")))
+# Thời gian giữ batch_id của các lô thay đổi tồn kho đã ghi (đủ dài hơn thời gian retry của activity)
+STOCK_BATCH_RETENTION = datetime.timedelta(hours=int(os.getenv("STOCK_BATCH_RETENTION_HOURS", "24")))
+# Lý do trả về khi sản phẩm không tồn tại, API dùng để trả 404
+PRODUCT_NOT_FOUND = "Product not found"
+
+
+def stock_delta_statement(product_id: int, delta: int):
+    """
+    UPDATE products SET stock_quantity = stock_quantity + :delta
+    WHERE id = :id AND stock_quantity + :delta >= 0 RETURNING stock_quantity
+    """
+    return (
+        update(Product)
+        .where(Product.id == product_id, Product.stock_quantity + delta >= 0)
+        .values(stock_quantity=Product.stock_quantity + delta)
+        .returning(Product.stock_quantity)
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def adjust_stock(db: AsyncSession, product_id: int, delta: int) -> Dict[str, Any]:
+    """
+    Cộng/trừ tồn kho nguyên tử trong database, không đọc-sửa-ghi trong Python.
+    Các cập nhật đồng thời trên cùng sản phẩm không làm mất dữ liệu.
+    """
+    new_quantity = await db.scalar(stock_delta_statement(product_id, delta))
+    if new_quantity is not None:
+        mark_products_changed(db, [product_id])
+    await db.commit()
+
+    if new_quantity is not None:
+        return {"success": True, "current_stock": new_quantity}
+
+    exists = await db.scalar(select(Product.id).where(Product.id == product_id))
+    if exists is None:
+        return {"success": False, "reason": PRODUCT_NOT_FOUND}
+    return {"success": False, "reason": "Insufficient stock"}
+
+
+async def apply_stock_deltas(
+    db: AsyncSession,
+    product_id: int,
+    deltas: List[int],
+    batch_id: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Ghi một lô thay đổi tồn kho bằng một câu UPDATE cho tổng thay đổi.
+
+    Nếu tổng thay đổi làm tồn kho âm thì áp dụng lần lượt từng thay đổi trong
+    cùng transaction, các thay đổi làm tồn kho âm bị từ chối riêng lẻ.
+    Trả về kết quả cho từng thay đổi theo thứ tự đầu vào.
+
+    batch_id được ghi cùng transaction với UPDATE: gọi lại với batch_id đã ghi
+    (activity retry sau khi đã commit) trả về kết quả đã lưu, không ghi lần nữa.
+    """
+    if batch_id is not None:
+        stored = await _stored_batch_result(db, batch_id)
+        if stored is not None:
+            return stored
+
+    new_quantity = await db.scalar(stock_delta_statement(product_id, sum(deltas)))
+    if new_quantity is not None:
+        mark_products_changed(db, [product_id])
+        result = {
+            "success": True,
+            "current_stock": new_quantity,
+            "results": [{"success": True} for _ in deltas]
+        }
+        return await _commit_batch(db, product_id, batch_id, result)
+
+    current_stock = await db.scalar(select(Product.stock_quantity).where(Product.id == product_id))
+    if current_stock is None:
+        return {
+            "success": False,
+            "reason": PRODUCT_NOT_FOUND,
+            "results": [{"success": False, "reason": PRODUCT_NOT_FOUND} for _ in deltas]
+        }
+
+    results = []
+    for delta in deltas:
+        updated = await db.scalar(stock_delta_statement(product_id, delta))
+        if updated is None:
+            results.append({"success": False, "reason": "Insufficient stock"})
+        else:
+            current_stock = updated
+            results.append({"success": True})
+            mark_products_changed(db, [product_id])
+    result = {"success": True, "current_stock": current_stock, "results": results}
+    return await _commit_batch(db, product_id, batch_id, result)
+
+
+async def _stored_batch_result(db: AsyncSession, batch_id: str) -> Optional[Dict[str, Any]]:
+    stored = await db.scalar(select(StockDeltaBatch.result).where(StockDeltaBatch.batch_id == batch_id))
+    return json.loads(stored) if stored is not None else None
+
+
+async def _commit_batch(
+    db: AsyncSession,
+    product_id: int,
+    batch_id: Optional[str],
+    result: Dict[str, Any]
+) -> Dict[str, Any]:
+    if batch_id is None:
+        await db.commit()
+        return result
+    await db.execute(
+        delete(StockDeltaBatch).where(
+            StockDeltaBatch.product_id == product_id,
+            StockDeltaBatch.created_at < datetime.datetime.utcnow() - STOCK_BATCH_RETENTION
+        )
+    )
+    try:
+        await db.execute(
+            insert(StockDeltaBatch).values(batch_id=batch_id, product_id=product_id, result=json.dumps(result))
+        )
+        await db.commit()
+    except IntegrityError:
+        # Lần thử khác của cùng lô đã commit trước (chờ khoá dòng sản phẩm rồi trùng
+        # batch_id): bỏ các UPDATE của lần thử này, trả kết quả đã lưu
+        await db.rollback()
+        return await _stored_batch_result(db, batch_id)
+    return result
+
+
+async def reserve_stock(
+    db: AsyncSession,
+    order_id: int,
+    product_id: int,
+    quantity: int,
+    ttl: datetime.timedelta = RESERVATION_TTL
+) -> Dict[str, Any]:
+    """
+    Giữ hàng cho đơn hàng: trừ tồn kho và ghi reservation trong cùng một transaction.
+    Gọi lại cho cùng đơn hàng (activity retry) không trừ tồn kho lần nữa.
+    """
+    existing = await db.scalar(
+        select(StockReservation.status).where(StockReservation.order_id == order_id)
+    )
+    if existing == ReservationStatus.HELD.value or existing == ReservationStatus.COMMITTED.value:
+        return {"success": True}
+    if existing == ReservationStatus.RELEASED.value:
+        return {"success": False, "reason": "Reservation already released"}
+
+    # Trả lại các lượt giữ hàng đã hết hạn của sản phẩm trước khi giữ hàng mới
+    await release_expired_reservations(db, product_id=product_id)
+
+    new_quantity = await db.scalar(stock_delta_statement(product_id, -quantity))
+    if new_quantity is None:
+        # Vẫn commit phần hoàn trả các reservation hết hạn
+        await db.commit()
+        return {"success": False, "reason": "Insufficient stock"}
+
+    mark_products_changed(db, [product_id])
+    await db.execute(
+        insert(StockReservation).values(
+            order_id=order_id,
+            product_id=product_id,
+            quantity=quantity,
+            status=ReservationStatus.HELD.value,
+            expires_at=datetime.datetime.utcnow() + ttl
+        )
+    )
+    await db.commit()
+    return {"success": True, "current_stock": new_quantity}
+
+
+async def find_product_id(db: AsyncSession, product_name: str) -> Optional[int]:
+    """
+    Đơn hàng chỉ lưu tên sản phẩm, tìm sản phẩm đang bán tương ứng
+    """
+    return await db.scalar(
+        select(Product.id)
+        .where(Product.name == product_name, Product.is_active == True)
+        .order_by(Product.id)
+        .limit(1)
+    )
+
+
+async def _restore_reservations(db: AsyncSession, condition, to_status: ReservationStatus) -> int:
+    # Chỉ đổi trạng thái các reservation đang HELD, nên mỗi reservation chỉ được
+    # hoàn trả tồn kho một lần dù được gọi đồng thời
+    released = (await db.execute(
+        update(StockReservation)
+        .where(condition, StockReservation.status == ReservationStatus.HELD.value)
+        .values(status=to_status.value)
+        .returning(StockReservation.product_id, StockReservation.quantity)
+        .execution_options(synchronize_session=False)
+    )).all()
+
+    if released:
+        mark_products_changed(db, [product_id for product_id, _ in released])
+    for product_id, quantity in released:
+        await db.execute(
+            update(Product)
+            .where(Product.id == product_id)
+            .values(stock_quantity=Product.stock_quantity + quantity)
+            .execution_options(synchronize_session=False)
+        )
+    return len(released)
+
+
+async def release_reservation(db: AsyncSession, order_id: int) -> bool:
+    """
+    Hoàn trả tồn kho đang giữ cho đơn hàng thất bại
+    """
+    count = await _restore_reservations(
+        db, StockReservation.order_id == order_id, ReservationStatus.RELEASED
+    )
+    await db.commit()
+    return count > 0
+
+
+async def commit_reservation(db: AsyncSession, order_id: int) -> bool:
+    """
+    Xác nhận reservation khi đơn hàng hoàn thành, tồn kho đã trừ được giữ nguyên
+    """
+    result = await db.execute(
+        update(StockReservation)
+        .where(
+            StockReservation.order_id == order_id,
+            StockReservation.status == ReservationStatus.HELD.value
+        )
+        .values(status=ReservationStatus.COMMITTED.value)
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    return result.rowcount > 0
+
+
+async def release_expired_reservations(db: AsyncSession, product_id: Optional[int] = None) -> int:
+    """
+    Hoàn trả tồn kho của các reservation HELD đã hết hạn.
+    Không commit, người gọi quyết định ranh giới transaction.
+    """
+    condition = StockReservation.expires_at < datetime.datetime.utcnow()
+    if product_id is not None:
+        condition = condition & (StockReservation.product_id == product_id)
+    return await _restore_reservations(db, condition, ReservationStatus.RELEASED)
@@ -0,0 +1,52 @@
+import os
+from typing import Iterable
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.core.cache import create_cache
+
+PRODUCT_CACHE_SIZE = int(os.getenv("PRODUCT_CACHE_SIZE", "10000"))
+# TTL giới hạn độ trễ khi một process khác ghi sản phẩm mà không dùng cache
+# chung (CACHE_URL), ví dụ worker giữ hàng cho đơn hàng
+PRODUCT_CACHE_TTL = float(os.getenv("PRODUCT_CACHE_TTL_SECONDS", "30"))
+
+# Response đã serialize của GET /products/{id} theo id
+product_cache = create_cache("product", maxsize=PRODUCT_CACHE_SIZE, ttl=PRODUCT_CACHE_TTL)
+# Các trang của GET /products theo (cursor, limit, bộ lọc)
+product_list_cache = create_cache("product-list", maxsize=1024, ttl=PRODUCT_CACHE_TTL)
+# Báo cáo tồn kho thấp theo (threshold, cursor, limit). TTL giới hạn độ trễ
+# khi phiên bản max(updated_at) không đổi dù dữ liệu đã đổi (transaction commit muộn)
+low_stock_cache = create_cache("low-stock", maxsize=256, ttl=30)
+
+_CHANGED_PRODUCTS = "changed_products"
+
+
+def invalidate_products(product_ids: Iterable[int] = ()) -> None:
+    """
+    Xoá cache của các sản phẩm đã thay đổi. Mọi trang danh sách và báo cáo
+    đều có thể chứa sản phẩm đó nên bị xoá toàn bộ.
+    """
+    for product_id in product_ids:
+        product_cache.delete(product_id)
+    product_list_cache.clear()
+    low_stock_cache.clear()
+
+
+def mark_products_changed(db, product_ids: Iterable[int]) -> None:
+    """
+    Ghi nhận sản phẩm bị thay đổi trong transaction hiện tại (Session hoặc
+    AsyncSession), cache chỉ bị xoá sau khi transaction commit thành công
+    """
+    db.info.setdefault(_CHANGED_PRODUCTS, set()).update(product_ids)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session: Session) -> None:
+    product_ids = session.info.pop(_CHANGED_PRODUCTS, None)
+    if product_ids is not None:
+        invalidate_products(product_ids)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_after_rollback(session: Session) -> None:
+    session.info.pop(_CHANGED_PRODUCTS, None)
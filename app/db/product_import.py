@@ -0,0 +1,126 @@
+import csv
+import io
+import os
+from typing import Any, Dict, Iterator, List, Optional
+import orjson
+from pydantic import ValidationError
+from sqlalchemy import delete, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.database import SessionLocal
+from app.models.product import Product, ProductImportChunk
+from app.schemas.product import ProductCreate
+
+# Số dòng mỗi chunk: một lần validate, một lần ghi và một transaction
+PRODUCT_IMPORT_CHUNK_SIZE = int(os.getenv("PRODUCT_IMPORT_CHUNK_SIZE", "5000"))
+# Số lỗi validate được giữ lại để trả về
+MAX_REPORTED_ERRORS = 100
+
+# Thứ tự cột khi ghi bằng COPY
+IMPORT_COLUMNS = ("name", "description", "price", "stock_quantity", "category", "is_active")
+
+
+async def read_chunk(db: AsyncSession, import_id: str, index: int) -> Optional[List[Dict[str, Any]]]:
+    """
+    Các dòng của chunk, None nếu chunk đã được ghi (và xoá)
+    """
+    data = await db.scalar(
+        select(ProductImportChunk.rows)
+        .where(ProductImportChunk.import_id == import_id, ProductImportChunk.chunk_index == index)
+    )
+    if data is None:
+        return None
+    return [orjson.loads(line) for line in data.splitlines()]
+
+
+def delete_chunks_statement(import_id: str):
+    return delete(ProductImportChunk).where(ProductImportChunk.import_id == import_id)
+
+
+def discard_import_chunks(import_id: str) -> None:
+    with SessionLocal() as db:
+        db.execute(delete_chunks_statement(import_id))
+        db.commit()
+
+
+def _iter_records(path: str, import_format: str) -> Iterator[Dict[str, Any]]:
+    with open(path, "rb") as f:
+        if import_format == "csv":
+            for record in csv.DictReader(io.TextIOWrapper(f, encoding="utf-8-sig", newline="")):
+                # Ô trống dùng giá trị mặc định của ProductCreate
+                yield {key: value for key, value in record.items() if key and value != ""}
+        else:
+            for line in f:
+                if line.strip():
+                    yield orjson.loads(line)
+
+
+def stage_import(path: str, import_format: str, import_id: str) -> Dict[str, Any]:
+    """
+    Đọc file upload theo từng dòng, validate qua ProductCreate và ghi các dòng hợp lệ
+    thành chunk NDJSON (PRODUCT_IMPORT_CHUNK_SIZE dòng) vào bảng product_import_chunks
+    cho activity import. Bộ nhớ dùng không phụ thuộc kích thước file.
+    """
+    total_rows = 0
+    invalid_rows = 0
+    total_chunks = 0
+    errors: List[Dict[str, Any]] = []
+    chunk: List[bytes] = []
+
+    def flush() -> None:
+        nonlocal total_chunks, chunk
+        db.execute(insert(ProductImportChunk).values(
+            import_id=import_id, chunk_index=total_chunks, rows=b"".join(chunk)
+        ))
+        db.commit()
+        total_chunks += 1
+        chunk = []
+
+    line = 0
+    with SessionLocal() as db:
+        try:
+            for line, record in enumerate(_iter_records(path, import_format), start=1):
+                total_rows += 1
+                try:
+                    product = ProductCreate.model_validate(record)
+                except (ValidationError, ValueError) as e:
+                    invalid_rows += 1
+                    if len(errors) < MAX_REPORTED_ERRORS:
+                        errors.append({"row": line, "error": str(e)})
+                    continue
+                chunk.append(orjson.dumps(product.model_dump(mode="json")) + b"\n")
+                if len(chunk) >= PRODUCT_IMPORT_CHUNK_SIZE:
+                    flush()
+        except (csv.Error, orjson.JSONDecodeError, UnicodeDecodeError) as e:
+            # Dòng hỏng làm dừng việc đọc phần còn lại của file
+            invalid_rows += 1
+            if len(errors) < MAX_REPORTED_ERRORS:
+                errors.append({"row": line + 1, "error": f"Could not parse file: {e}"})
+        if chunk:
+            flush()
+
+    return {
+        "total_rows": total_rows,
+        "invalid_rows": invalid_rows,
+        "total_chunks": total_chunks,
+        "errors": errors,
+    }
+
+
+async def insert_product_rows(db: AsyncSession, rows: List[Dict[str, Any]]) -> None:
+    """
+    Ghi một chunk sản phẩm trong transaction hiện tại: COPY trên Postgres (asyncpg),
+    các database khác dùng INSERT nhiều dòng (insertmanyvalues của SQLAlchemy)
+    """
+    records = [
+        (row["name"], row["description"], row["price"], row["stock_quantity"], row["category"], True)
+        for row in rows
+    ]
+    connection = await db.connection()
+    if connection.dialect.name == "postgresql" and connection.dialect.driver == "asyncpg":
+        raw_connection = await connection.get_raw_connection()
+        await raw_connection.driver_connection.copy_records_to_table(
+            Product.__tablename__, records=records, columns=IMPORT_COLUMNS
+        )
+        return
+    await db.execute(insert(Product), [dict(zip(IMPORT_COLUMNS, record)) for record in records])
@@ -0,0 +1,95 @@
+import datetime
+from typing import Dict, Any, List, Optional
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.product import Product, SweepWatermark
+
+
+def _parse(value: Optional[str]) -> Optional[datetime.datetime]:
+    return datetime.datetime.fromisoformat(value) if value else None
+
+
+def low_stock_condition(threshold: int, since: Optional[str], until: Optional[str]):
+    """
+    Sản phẩm đang bán có tồn kho dưới threshold và updated_at trong [since, until].
+    since là mốc của lần quét trước (None: quét toàn bộ); mốc được tính cả hai đầu
+    nên sản phẩm cập nhật đúng lúc chốt mốc được xem lại ở lần sau thay vì bị bỏ sót.
+    """
+    condition = (Product.is_active == True) & (Product.stock_quantity < threshold)
+    if since:
+        condition = condition & (Product.updated_at >= _parse(since))
+    if until:
+        condition = condition & (Product.updated_at <= _parse(until))
+    return condition
+
+
+async def begin_sweep(db: AsyncSession, name: str, incremental: bool) -> Dict[str, Optional[str]]:
+    """
+    Chốt khoảng updated_at của lần quét: từ mốc đã lưu (nếu incremental) đến max(updated_at) hiện tại
+    """
+    since = None
+    if incremental:
+        since = await db.scalar(select(SweepWatermark.watermark).where(SweepWatermark.name == name))
+    until = await db.scalar(select(func.max(Product.updated_at)))
+    return {
+        "since": since.isoformat() if since else None,
+        "until": until.isoformat() if until else None,
+    }
+
+
+async def plan_pages(
+    db: AsyncSession,
+    threshold: int,
+    since: Optional[str],
+    until: Optional[str],
+    after_id: int,
+    page_size: int,
+    max_pages: int
+) -> List[int]:
+    """
+    Id cuối của tối đa max_pages trang tiếp theo sau after_id, mỗi trang page_size sản phẩm
+    khớp điều kiện. Chỉ đọc cột id (index), các trang sau đó được quét song song.
+    Ít hơn max_pages mốc nghĩa là trang sau mốc cuối là trang cuối cùng.
+    """
+    numbered = (
+        select(Product.id, func.row_number().over(order_by=Product.id).label("position"))
+        .where(low_stock_condition(threshold, since, until), Product.id > after_id)
+        .order_by(Product.id)
+        .limit(page_size * max_pages)
+        .subquery()
+    )
+    return list((await db.scalars(
+        select(numbered.c.id)
+        .where(numbered.c.position % page_size == 0)
+        .order_by(numbered.c.id)
+    )).all())
+
+
+async def scan_page(
+    db: AsyncSession,
+    threshold: int,
+    since: Optional[str],
+    until: Optional[str],
+    after_id: int,
+    last_id: Optional[int],
+    limit: int
+) -> List[Dict[str, Any]]:
+    """
+    Một lô sản phẩm tồn kho thấp với id trong (after_id, last_id], theo thứ tự id
+    """
+    query = select(Product.id, Product.name, Product.stock_quantity).where(
+        low_stock_condition(threshold, since, until),
+        Product.id > after_id
+    )
+    if last_id is not None:
+        query = query.where(Product.id <= last_id)
+    rows = (await db.execute(query.order_by(Product.id).limit(limit))).all()
+    return [{"id": row.id, "name": row.name, "current_stock": row.stock_quantity} for row in rows]
+
+
+async def save_watermark(db: AsyncSession, name: str, watermark: Optional[str]) -> None:
+    if not watermark:
+        return
+    await db.merge(SweepWatermark(name=name, watermark=_parse(watermark)))
+    await db.commit()
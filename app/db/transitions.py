@@ -0,0 +1,77 @@
+from typing import Dict, Any, Optional
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.order import Order, OrderStatus, FailureReason
+
+# Các trạng thái nguồn hợp lệ cho từng trạng thái đích
+ORDER_TRANSITIONS = {
+    OrderStatus.VALIDATING: [OrderStatus.RECEIVED],
+    OrderStatus.PROCESSING_PAYMENT: [OrderStatus.VALIDATING],
+    OrderStatus.SHIPPING: [OrderStatus.PROCESSING_PAYMENT],
+    OrderStatus.SENDING_CONFIRMATION: [OrderStatus.SHIPPING],
+    OrderStatus.COMPLETED: [OrderStatus.SHIPPING, OrderStatus.SENDING_CONFIRMATION],
+    OrderStatus.FAILED: [
+        OrderStatus.RECEIVED,
+        OrderStatus.VALIDATING,
+        OrderStatus.PROCESSING_PAYMENT,
+        OrderStatus.SHIPPING,
+    ],
+}
+
+# Các cột activity cần để xử lý một bước
+ORDER_STEP_COLUMNS = (
+    Order.id,
+    Order.status,
+    Order.product_name,
+    Order.quantity,
+    Order.price,
+    Order.total_amount,
+    Order.shipping_address,
+)
+
+
+async def transition_order(
+    db: AsyncSession,
+    order_id: int,
+    to_status: OrderStatus,
+    failure_reason: Optional[FailureReason] = None,
+) -> Dict[str, Any]:
+    """
+    Chuyển trạng thái đơn hàng bằng một câu UPDATE có điều kiện.
+
+    Câu lệnh chỉ áp dụng khi trạng thái hiện tại nằm trong ORDER_TRANSITIONS,
+    nên bước chạy sai thứ tự sẽ bị từ chối. Nếu đơn hàng đã ở đúng trạng thái
+    đích (activity được retry sau khi đã commit) thì coi như thành công.
+    """
+    values = {"status": to_status.value}
+    if failure_reason is not None:
+        values["failure_reason"] = failure_reason.value
+
+    stmt = (
+        update(Order)
+        .where(
+            Order.id == order_id,
+            Order.status.in_([status.value for status in ORDER_TRANSITIONS[to_status]]),
+        )
+        .values(**values)
+        .returning(*ORDER_STEP_COLUMNS)
+        .execution_options(synchronize_session=False)
+    )
+    row = (await db.execute(stmt)).first()
+    await db.commit()
+
+    if row is not None:
+        return {"success": True, "order": row}
+
+    # Không có dòng nào được cập nhật: đơn hàng không tồn tại, bước đã được
+    # áp dụng trước đó, hoặc chuyển trạng thái không hợp lệ
+    row = (await db.execute(select(*ORDER_STEP_COLUMNS).where(Order.id == order_id))).first()
+    if row is None:
+        return {"success": False, "reason": "Order not found"}
+    if row.status == to_status.value:
+        return {"success": True, "order": row}
+    return {
+        "success": False,
+        "reason": f"Invalid transition from {row.status} to {to_status.value}"
+    }
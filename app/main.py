@@ -1,14 +1,63 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Response
+from fastapi.middleware.gzip import GZipMiddleware
+from starlette.datastructures import Headers
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 from app.api import auth, order, product
-from app.db.database import engine
-from app.models import user, order as order_model, product as product_model
+from app.api.idempotency import IdempotencyMiddleware, purge_expired_idempotency_keys
+from app.db.database import create_tables
+from app.workers.client import TemporalClientManager
+from app.workers.outbox import OrderOutboxDispatcher
+from app.core.security import shutdown_password_pool
+from app.core.metrics import MetricsMiddleware, create_temporal_runtime
+import os
 
-# Create database tables
-user.Base.metadata.create_all(bind=engine)
-order_model.Base.metadata.create_all(bind=engine)
-product_model.Base.metadata.create_all(bind=engine)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Create database tables. API vẫn khởi động khi database chưa sẵn sàng,
+    # các endpoint cần database sẽ lỗi cho đến khi kết nối được
+    try:
+        create_tables()
+        purge_expired_idempotency_keys()
+    except Exception as e:
+        print(f"Could not create database tables: {e}")
+    
+    # Temporal client dùng chung cho mọi router, kết nối ở request đầu tiên
+    # Metrics của Temporal SDK (client) chỉ bật khi cấu hình API_TEMPORAL_METRICS_ADDRESS,
+    # biến riêng với worker để dùng chung .env mà không trùng port
+    runtime = create_temporal_runtime(os.getenv("API_TEMPORAL_METRICS_ADDRESS"))
+    app.state.temporal = TemporalClientManager(runtime=runtime)
 
-app = FastAPI(title="Temporal API")
+    # Start workflow cho các đơn hàng trong outbox; tắt bằng ORDER_OUTBOX_DISPATCHER=0
+    # khi chạy dispatcher riêng (python -m app.workers.outbox)
+    app.state.outbox = None
+    if os.getenv("ORDER_OUTBOX_DISPATCHER", "1") != "0":
+        app.state.outbox = OrderOutboxDispatcher(app.state.temporal)
+        app.state.outbox.start()
+    yield
+    if app.state.outbox is not None:
+        await app.state.outbox.stop()
+    await app.state.temporal.close()
+    shutdown_password_pool()
+
+class EventStreamAwareGZipMiddleware(GZipMiddleware):
+    """
+    GZipMiddleware bỏ qua request Server-Sent Events: bộ nén giữ lại các event
+    nhỏ trong buffer cho đến khi stream kết thúc
+    """
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and "text/event-stream" in Headers(scope=scope).get("accept", ""):
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
+
+app = FastAPI(title="Temporal API", lifespan=lifespan)
+# Idempotency-Key cho các request ghi, chạy trong MetricsMiddleware để response trả lại cũng được đo
+app.add_middleware(IdempotencyMiddleware)
+app.add_middleware(MetricsMiddleware)
+# Nén gzip các response lớn (danh sách) khi client gửi Accept-Encoding: gzip
+app.add_middleware(EventStreamAwareGZipMiddleware, minimum_size=int(os.getenv("GZIP_MINIMUM_SIZE", "1024")))
 
 # Include routers
 app.include_router(auth.router, prefix="/api/auth", tags=["auth"])
@@ -17,4 +66,8 @@ app.include_router(product.router, prefix="/api", tags=["products"])
 
 @app.get("/")
 async def root():
-    return {"message": "Welcome to Temporal API"} 
\ No newline at end of file
+    return {"message": "Welcome to Temporal API"}
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,30 @@
+from sqlalchemy import Column, Integer, String, DateTime, LargeBinary, Text, func
+from app.db.database import Base
+import enum
+
+class IdempotencyStatus(str, enum.Enum):
+    IN_PROGRESS = "in_progress"
+    COMPLETED = "completed"
+
+class IdempotencyKey(Base):
+    """
+    Response đã lưu của một request có header Idempotency-Key.
+    Dòng IN_PROGRESS là khoá của request đang chạy, được gia hạn trong khi request
+    chạy và hết hạn sau thời gian ngắn để request gửi lại được thực thi nếu process
+    đang chạy bị chết.
+    """
+    __tablename__ = "idempotency_keys"
+
+    # Hash của (method, path, người gọi, Idempotency-Key)
+    key = Column(String, primary_key=True)
+    # Hash của request (query, body) để phát hiện key bị dùng lại cho request khác,
+    # ghi khi request hoàn thành
+    fingerprint = Column(String)
+    status = Column(String, default=IdempotencyStatus.IN_PROGRESS)
+    # Token của lần giành khoá: chỉ request giữ khoá được gia hạn, lưu hoặc xoá dòng
+    claim_token = Column(String, nullable=True)
+    response_status = Column(Integer, nullable=True)
+    response_headers = Column(Text, nullable=True)
+    response_body = Column(LargeBinary, nullable=True)
+    expires_at = Column(DateTime, index=True)
+    created_at = Column(DateTime, server_default=func.now())
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, Boolean, Enum, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, Float, Boolean, Enum, ForeignKey, DateTime, Index, func
 from sqlalchemy.orm import relationship
 from app.db.database import Base
 import enum
@@ -34,3 +34,28 @@ class Order(Base):
     
     user = relationship("User", back_populates="orders")
 
+    # Index cho phân trang keyset (ORDER BY id) kết hợp với bộ lọc danh sách
+    __table_args__ = (
+        Index("ix_orders_status_id", "status", "id"),
+        Index("ix_orders_user_id_id", "user_id", "id"),
+    )
+
+class OrderOutbox(Base):
+    """
+    Đơn hàng chờ start workflow, ghi cùng transaction với đơn hàng.
+    Dòng được xoá khi workflow đã start (app.workers.outbox).
+    """
+    __tablename__ = "order_outbox"
+
+    id = Column(Integer, primary_key=True, index=True)
+    order_id = Column(Integer, ForeignKey("orders.id"), unique=True)
+    attempts = Column(Integer, default=0)
+    last_error = Column(String, nullable=True)
+    # Thời điểm được dispatch tiếp (UTC), lùi lại sau mỗi lần start lỗi
+    available_at = Column(DateTime, default=datetime.datetime.utcnow)
+    created_at = Column(DateTime, server_default=func.now())
+
+    # Dispatcher lấy các dòng đến hạn theo thứ tự id
+    __table_args__ = (
+        Index("ix_order_outbox_available_at_id", "available_at", "id"),
+    )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, Boolean, Enum, ForeignKey, DateTime, func
+from sqlalchemy import Column, Integer, String, Float, Boolean, Enum, ForeignKey, DateTime, Index, LargeBinary, func
 from sqlalchemy.orm import relationship
 from app.db.database import Base
 import enum
@@ -28,4 +28,108 @@ class Product(Base):
     category = Column(String, default=ProductCategory.OTHER)
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime, server_default=func.now())
-    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now()) 
\ No newline at end of file
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+    # Index cho phân trang keyset (ORDER BY id) kết hợp với bộ lọc danh sách
+    __table_args__ = (
+        Index("ix_products_category_is_active_id", "category", "is_active", "id"),
+        Index("ix_products_is_active_id", "is_active", "id"),
+        # Partial index cho báo cáo tồn kho thấp: chỉ chứa sản phẩm đang bán,
+        # sắp theo (stock_quantity, id) để lọc stock < threshold và phân trang
+        Index(
+            "ix_products_active_low_stock",
+            "stock_quantity",
+            "id",
+            postgresql_where=(is_active == True),
+            sqlite_where=(is_active == True)
+        ),
+        # max(updated_at) dùng làm phiên bản dữ liệu để kiểm tra cache
+        Index("ix_products_updated_at", "updated_at"),
+    )
+
+class ReservationStatus(str, enum.Enum):
+    HELD = "held"
+    RELEASED = "released"
+    COMMITTED = "committed"
+
+class StockReservation(Base):
+    """
+    Lượng tồn kho được giữ cho một đơn hàng cho đến khi hết hạn (TTL)
+    """
+    __tablename__ = "stock_reservations"
+
+    id = Column(Integer, primary_key=True, index=True)
+    order_id = Column(Integer, ForeignKey("orders.id"), unique=True)
+    product_id = Column(Integer, ForeignKey("products.id"))
+    quantity = Column(Integer)
+    status = Column(String, default=ReservationStatus.HELD)
+    expires_at = Column(DateTime)
+    created_at = Column(DateTime, server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_stock_reservations_status_expires_at", "status", "expires_at"),
+        Index("ix_stock_reservations_product_id_status", "product_id", "status"),
+    )
+
+class StockDeltaBatch(Base):
+    """
+    Lô thay đổi tồn kho đã ghi, lưu trong cùng transaction với UPDATE tồn kho.
+    Activity chạy lại với cùng batch_id nhận lại kết quả đã lưu thay vì ghi lần nữa.
+    """
+    __tablename__ = "stock_delta_batches"
+
+    batch_id = Column(String, primary_key=True)
+    product_id = Column(Integer, ForeignKey("products.id"))
+    # Kết quả trả về cho workflow (JSON)
+    result = Column(String)
+    created_at = Column(DateTime, server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_stock_delta_batches_product_id_created_at", "product_id", "created_at"),
+    )
+
+class SweepWatermark(Base):
+    """
+    Mốc updated_at của lần quét gần nhất, lần quét sau chỉ xem sản phẩm thay đổi từ mốc này
+    """
+    __tablename__ = "sweep_watermarks"
+
+    name = Column(String, primary_key=True)
+    watermark = Column(DateTime)
+
+class ProductImportStatus(str, enum.Enum):
+    PENDING = "pending"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+class ProductImport(Base):
+    """
+    Một lần import sản phẩm hàng loạt. committed_chunks được cập nhật trong cùng
+    transaction với các dòng của chunk, nên activity chạy lại tiếp tục đúng chỗ đã dừng.
+    """
+    __tablename__ = "product_imports"
+
+    id = Column(String, primary_key=True)
+    status = Column(String, default=ProductImportStatus.PENDING)
+    total_rows = Column(Integer, default=0)
+    invalid_rows = Column(Integer, default=0)
+    total_chunks = Column(Integer, default=0)
+    committed_chunks = Column(Integer, default=0)
+    imported_rows = Column(Integer, default=0)
+    # Lỗi validate của một số dòng đầu tiên (JSON)
+    errors = Column(String, nullable=True)
+    created_at = Column(DateTime, server_default=func.now())
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+class ProductImportChunk(Base):
+    """
+    Một chunk đã validate của lần import (NDJSON), chờ activity ghi vào products.
+    Lưu trong database để API và worker không cần dùng chung filesystem; chunk bị
+    xoá trong cùng transaction ghi các dòng của nó.
+    """
+    __tablename__ = "product_import_chunks"
+
+    import_id = Column(String, primary_key=True)
+    chunk_index = Column(Integer, primary_key=True)
+    rows = Column(LargeBinary)
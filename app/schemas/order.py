@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import Optional, List
 from app.models.order import OrderStatus, FailureReason
 
 class OrderBase(BaseModel):
@@ -23,4 +23,20 @@ class OrderResponse(OrderBase):
         
 class OrderUpdate(BaseModel):
     status: Optional[str] = None
-    failure_reason: Optional[str] = None 
\ No newline at end of file
+    failure_reason: Optional[str] = None
+
+class OrderBatchCreate(BaseModel):
+    orders: List[OrderCreate] = Field(..., min_length=1, max_length=10000)
+
+class OrderBatchItemResult(BaseModel):
+    index: int
+    order_id: int
+    status: str
+    workflow_id: Optional[str] = None
+    error: Optional[str] = None
+
+class OrderBatchResponse(BaseModel):
+    total: int
+    started: int
+    failed: int
+    results: List[OrderBatchItemResult]
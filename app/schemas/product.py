@@ -42,4 +42,20 @@ class LowStockProduct(BaseModel):
 
 class LowStockReport(BaseModel):
     low_stock_count: int
-    products: List[LowStockProduct] 
\ No newline at end of file
+    products: List[LowStockProduct]
+
+
+class ProductImportError(BaseModel):
+    row: int
+    error: str
+
+
+class ProductImportResponse(BaseModel):
+    import_id: str
+    status: str
+    total_rows: int
+    invalid_rows: int
+    total_chunks: int
+    committed_chunks: int
+    imported_rows: int
+    errors: List[ProductImportError] = []
@@ -14,6 +14,10 @@ class User(UserBase):
     class Config:
         from_attributes = True
 
+class CurrentUser(BaseModel):
+    id: int
+    username: str
+
 class Token(BaseModel):
     access_token: str
     token_type: str
@@ -1,22 +1,172 @@
 import asyncio
+import time
+from datetime import timedelta
+from typing import Dict, List, Optional
+from fastapi import HTTPException, Request, status
 from temporalio.client import Client
+from temporalio.converter import DataConverter
+from temporalio.runtime import Runtime
 import os
 from dotenv import load_dotenv
+from app.core.codec import create_data_converter
 
 # Đảm bảo .env được load
 load_dotenv()
 
-# Biến cục bộ lưu trữ client
-_client = None
+DEFAULT_TEMPORAL_SERVER_URL = "localhost:7233"
+DEFAULT_NAMESPACE = "default"
+DEFAULT_TASK_QUEUE = "workflow-queue"
 
-async def get_client() -> Client:
+# Mỗi domain có task queue riêng để tải của domain này không làm nghẽn domain khác
+AUTH_TASK_QUEUE = os.getenv("AUTH_TASK_QUEUE", "auth-queue")
+ORDER_TASK_QUEUE = os.getenv("ORDER_TASK_QUEUE", "order-queue")
+PRODUCT_TASK_QUEUE = os.getenv("PRODUCT_TASK_QUEUE", "product-queue")
+# Queue chung trước khi tách theo domain: worker vẫn poll queue này để các workflow
+# đã start trên đó chạy xong. Đặt rỗng để tắt khi queue đã hết workflow
+LEGACY_TASK_QUEUE = os.getenv("LEGACY_TASK_QUEUE", DEFAULT_TASK_QUEUE)
+
+def _parse_local_steps(value: Optional[str]) -> Optional[List[str]]:
+    if value is None:
+        return None
+    return [step.strip() for step in value.split(",") if step.strip() and step.strip() != "none"]
+
+# Bước của OrderWorkflow chạy dạng local activity, truyền vào workflow khi start
+# (tên activity, phân tách bằng dấu phẩy; "none" để mọi bước là activity thường).
+# Không đặt thì dùng mặc định của workflow
+ORDER_LOCAL_STEPS = _parse_local_steps(os.getenv("ORDER_LOCAL_STEPS"))
+
+TASK_QUEUES = {
+    "auth": AUTH_TASK_QUEUE,
+    "order": ORDER_TASK_QUEUE,
+    "product": PRODUCT_TASK_QUEUE,
+}
+
+
+class TemporalClientManager:
+    """
+    Quản lý temporal client dùng chung cho toàn bộ process.
+
+    Một kết nối gRPC được tạo một lần và chia sẻ giữa các namespace;
+    kết nối được kiểm tra định kỳ và tạo lại khi server khởi động lại.
+    """
+
+    def __init__(
+        self,
+        target_host: Optional[str] = None,
+        namespace: Optional[str] = None,
+        task_queues: Optional[Dict[str, str]] = None,
+        health_check_interval: float = 30.0,
+        runtime: Optional[Runtime] = None,
+        data_converter: Optional[DataConverter] = None,
+    ):
+        self.target_host = target_host or os.getenv("TEMPORAL_SERVER_URL", DEFAULT_TEMPORAL_SERVER_URL)
+        self.namespace = namespace or os.getenv("TEMPORAL_NAMESPACE", DEFAULT_NAMESPACE)
+        self.task_queues = task_queues or {
+            "default": os.getenv("TEMPORAL_TASK_QUEUE", DEFAULT_TASK_QUEUE),
+            **TASK_QUEUES,
+        }
+        self.health_check_interval = health_check_interval
+        self.runtime = runtime
+        # Nén và claim-check payload lớn, cấu hình giống worker
+        self.data_converter = data_converter or create_data_converter()
+
+        self._clients: Dict[str, Client] = {}
+        self._lock = asyncio.Lock()
+        self._last_health_check = 0.0
+
+    def task_queue(self, name: str = "default") -> str:
+        """
+        Trả về tên task queue đã cấu hình, mặc định là queue "default".
+        """
+        return self.task_queues.get(name, self.task_queues["default"])
+
+    async def get_client(self, namespace: Optional[str] = None) -> Client:
+        """
+        Trả về client cho namespace. Kết nối được tạo ở lần gọi đầu tiên.
+        """
+        namespace = namespace or self.namespace
+        client = self._clients.get(namespace)
+        if client is not None and not self._health_check_due():
+            return client
+
+        async with self._lock:
+            # Một coroutine khác có thể đã kết nối trong lúc chờ lock
+            if self._health_check_due() and self._clients:
+                await self._check_connection()
+
+            client = self._clients.get(namespace)
+            if client is None:
+                client = await self._create_client(namespace)
+                self._clients[namespace] = client
+            return client
+
+    async def reconnect(self) -> None:
+        """
+        Bỏ các client hiện tại và kết nối lại ở lần gọi tiếp theo.
+        """
+        async with self._lock:
+            self._clients.clear()
+            self._last_health_check = 0.0
+
+    async def close(self) -> None:
+        """
+        Đóng manager khi ứng dụng tắt.
+        """
+        async with self._lock:
+            # temporalio không có API close tường minh, kết nối được giải
+            # phóng khi không còn tham chiếu đến client
+            self._clients.clear()
+
+    def _health_check_due(self) -> bool:
+        return time.monotonic() - self._last_health_check > self.health_check_interval
+
+    async def _check_connection(self) -> None:
+        self._last_health_check = time.monotonic()
+        client = next(iter(self._clients.values()))
+        try:
+            healthy = await client.service_client.check_health(timeout=timedelta(seconds=5))
+        except Exception:
+            healthy = False
+        if not healthy:
+            print(f"Temporal server {self.target_host} không phản hồi, kết nối lại...")
+            self._clients.clear()
+
+    async def _create_client(self, namespace: str) -> Client:
+        # Các namespace dùng chung một kết nối gRPC
+        if self._clients:
+            existing = next(iter(self._clients.values()))
+            return Client(existing.service_client, namespace=namespace, data_converter=self.data_converter)
+
+        client = await Client.connect(
+            self.target_host,
+            namespace=namespace,
+            runtime=self.runtime,
+            data_converter=self.data_converter
+        )
+        self._last_health_check = time.monotonic()
+        return client
+
+
+# Manager mặc định của process
+temporal_manager = TemporalClientManager()
+
+
+async def get_client(namespace: Optional[str] = None) -> Client:
     """
     Trả về một temporal client. Tạo mới nếu chưa tồn tại.
     """
-    global _client
-    if _client is None:
-        # Lấy URL từ biến môi trường hoặc sử dụng giá trị mặc định
-        temporal_server_url = os.getenv("TEMPORAL_SERVER_URL", "localhost:7233")
-        _client = await Client.connect(temporal_server_url)
-    
-    return _client 
\ No newline at end of file
+    return await temporal_manager.get_client(namespace)
+
+
+async def get_temporal_client(request: Request) -> Client:
+    """
+    Dependency FastAPI trả về client của manager tạo trong lifespan.
+    """
+    manager: TemporalClientManager = getattr(request.app.state, "temporal", temporal_manager)
+    try:
+        return await manager.get_client()
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Temporal server unavailable: {str(e)}"
+        )
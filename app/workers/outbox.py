@@ -0,0 +1,145 @@
+import asyncio
+import datetime
+import os
+from typing import Optional
+from sqlalchemy import delete, select, update
+from temporalio.client import Client
+from temporalio.common import WorkflowIDReusePolicy
+from temporalio.exceptions import WorkflowAlreadyStartedError
+from app.db.database import AsyncSessionLocal
+from app.models.order import OrderOutbox
+from app.workflows.order_workflow import OrderWorkflow, order_workflow_id
+from app.workers.client import ORDER_LOCAL_STEPS, ORDER_TASK_QUEUE, TemporalClientManager
+
+# Số đơn hàng lấy mỗi lần và số workflow start đồng thời trong một lô
+OUTBOX_BATCH_SIZE = int(os.getenv("ORDER_OUTBOX_BATCH_SIZE", "100"))
+OUTBOX_START_CONCURRENCY = int(os.getenv("ORDER_OUTBOX_START_CONCURRENCY", "50"))
+# Chu kỳ quét khi không được đánh thức (đơn hàng do process khác ghi, dòng bị lùi lại)
+OUTBOX_POLL_INTERVAL = float(os.getenv("ORDER_OUTBOX_POLL_INTERVAL", "1.0"))
+OUTBOX_MAX_BACKOFF_SECONDS = 60
+
+
+class OrderOutboxDispatcher:
+    """
+    Đọc bảng order_outbox theo lô và start OrderWorkflow cho từng đơn hàng.
+
+    Workflow ID cố định theo đơn hàng và không cho dùng lại, nên start lặp lại
+    (process chết sau khi start nhưng trước khi xoá dòng) chỉ nhận
+    WorkflowAlreadyStartedError và được coi là thành công. Các dòng được khoá bằng
+    FOR UPDATE SKIP LOCKED để nhiều process cùng chạy dispatcher không start trùng.
+    """
+
+    def __init__(self, manager: TemporalClientManager, batch_size: int = OUTBOX_BATCH_SIZE):
+        self.manager = manager
+        self.batch_size = batch_size
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._semaphore = asyncio.Semaphore(OUTBOX_START_CONCURRENCY)
+
+    def notify(self) -> None:
+        """
+        Đánh thức dispatcher ngay sau khi có đơn hàng mới được commit
+        """
+        self._wakeup.set()
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def run(self) -> None:
+        while True:
+            try:
+                dispatched = await self.dispatch_once()
+            except Exception as e:
+                print(f"Order outbox dispatch failed: {e}")
+                dispatched = 0
+            # Lô đầy: còn dòng đến hạn, lấy tiếp ngay
+            if dispatched >= self.batch_size:
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=OUTBOX_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def dispatch_once(self) -> int:
+        """
+        Start workflow cho một lô đơn hàng đến hạn, trả về số dòng đã xử lý
+        """
+        now = datetime.datetime.utcnow()
+        async with AsyncSessionLocal() as db:
+            rows = (await db.execute(
+                select(OrderOutbox.id, OrderOutbox.order_id, OrderOutbox.attempts)
+                .where(OrderOutbox.available_at <= now)
+                .order_by(OrderOutbox.id)
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)
+            )).all()
+            if not rows:
+                return 0
+
+            client = await self.manager.get_client()
+            errors = await asyncio.gather(*(self._start(client, row.order_id) for row in rows))
+
+            started_ids = [row.id for row, error in zip(rows, errors) if error is None]
+            if started_ids:
+                await db.execute(delete(OrderOutbox).where(OrderOutbox.id.in_(started_ids)))
+            for row, error in zip(rows, errors):
+                if error is not None:
+                    # Lùi lại theo cấp số nhân, tối đa OUTBOX_MAX_BACKOFF_SECONDS
+                    delay = min(2 ** row.attempts, OUTBOX_MAX_BACKOFF_SECONDS)
+                    await db.execute(
+                        update(OrderOutbox)
+                        .where(OrderOutbox.id == row.id)
+                        .values(
+                            attempts=OrderOutbox.attempts + 1,
+                            last_error=error,
+                            available_at=now + datetime.timedelta(seconds=delay)
+                        )
+                    )
+            await db.commit()
+        return len(rows)
+
+    async def _start(self, client: Client, order_id: int) -> Optional[str]:
+        async with self._semaphore:
+            return await start_order_workflow(client, order_id)
+
+
+async def start_order_workflow(client: Client, order_id: int) -> Optional[str]:
+    """
+    Start OrderWorkflow cho đơn hàng, trả về lỗi hoặc None nếu workflow đã được start
+    (kể cả trước đó, bởi dispatcher hoặc request khác)
+    """
+    try:
+        await client.start_workflow(
+            OrderWorkflow.run,
+            args=[order_id, ORDER_LOCAL_STEPS],
+            id=order_workflow_id(order_id),
+            task_queue=ORDER_TASK_QUEUE,
+            id_reuse_policy=WorkflowIDReusePolicy.REJECT_DUPLICATE
+        )
+    except WorkflowAlreadyStartedError:
+        pass
+    except Exception as e:
+        return f"Failed to start order workflow: {str(e)}"
+    return None
+
+
+async def main() -> None:
+    """
+    Chạy dispatcher riêng, khi API được cấu hình ORDER_OUTBOX_DISPATCHER=0
+    """
+    dispatcher = OrderOutboxDispatcher(TemporalClientManager())
+    await dispatcher.run()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,88 @@
+import asyncio
+import os
+from datetime import timedelta
+from temporalio.client import (
+    Client,
+    Schedule,
+    ScheduleActionStartWorkflow,
+    ScheduleAlreadyRunningError,
+    ScheduleIntervalSpec,
+    ScheduleOverlapPolicy,
+    SchedulePolicy,
+    ScheduleSpec,
+)
+from app.workflows.product_workflow import ProductLowStockSweepWorkflow, StockReservationExpiryWorkflow
+from app.workers.client import PRODUCT_TASK_QUEUE, get_client
+
+LOW_STOCK_SWEEP_SCHEDULE_ID = "product-low-stock-sweep"
+# Chu kỳ quét tồn kho thấp, 0 để không tạo schedule
+LOW_STOCK_SWEEP_INTERVAL_MINUTES = int(os.getenv("LOW_STOCK_SWEEP_INTERVAL_MINUTES", "60"))
+LOW_STOCK_THRESHOLD = int(os.getenv("LOW_STOCK_THRESHOLD", "10"))
+
+STOCK_RESERVATION_EXPIRY_SCHEDULE_ID = "stock-reservation-expiry"
+# Chu kỳ hoàn trả tồn kho của các lượt giữ hàng hết hạn, 0 để không tạo schedule
+STOCK_RESERVATION_EXPIRY_INTERVAL_SECONDS = int(os.getenv("STOCK_RESERVATION_EXPIRY_INTERVAL_SECONDS", "60"))
+
+
+async def ensure_low_stock_sweep_schedule(client: Client) -> None:
+    """
+    Tạo Temporal Schedule chạy ProductLowStockSweepWorkflow (incremental) định kỳ.
+    Lần chạy trước chưa xong thì bỏ qua lần tiếp theo. Schedule đã tồn tại thì giữ nguyên.
+    """
+    if LOW_STOCK_SWEEP_INTERVAL_MINUTES <= 0:
+        return
+    await _ensure_schedule(
+        client,
+        LOW_STOCK_SWEEP_SCHEDULE_ID,
+        ScheduleActionStartWorkflow(
+            ProductLowStockSweepWorkflow.run,
+            args=[LOW_STOCK_THRESHOLD, True],
+            id=LOW_STOCK_SWEEP_SCHEDULE_ID,
+            task_queue=PRODUCT_TASK_QUEUE
+        ),
+        timedelta(minutes=LOW_STOCK_SWEEP_INTERVAL_MINUTES)
+    )
+
+
+async def ensure_stock_reservation_expiry_schedule(client: Client) -> None:
+    """
+    Tạo Temporal Schedule chạy StockReservationExpiryWorkflow định kỳ, để lượt giữ hàng
+    hết hạn được hoàn trả cả khi không có đơn hàng mới cho sản phẩm đó
+    """
+    if STOCK_RESERVATION_EXPIRY_INTERVAL_SECONDS <= 0:
+        return
+    await _ensure_schedule(
+        client,
+        STOCK_RESERVATION_EXPIRY_SCHEDULE_ID,
+        ScheduleActionStartWorkflow(
+            StockReservationExpiryWorkflow.run,
+            id=STOCK_RESERVATION_EXPIRY_SCHEDULE_ID,
+            task_queue=PRODUCT_TASK_QUEUE
+        ),
+        timedelta(seconds=STOCK_RESERVATION_EXPIRY_INTERVAL_SECONDS)
+    )
+
+
+async def _ensure_schedule(client: Client, schedule_id: str, action: ScheduleActionStartWorkflow, every: timedelta) -> None:
+    try:
+        await client.create_schedule(
+            schedule_id,
+            Schedule(
+                action=action,
+                spec=ScheduleSpec(intervals=[ScheduleIntervalSpec(every=every)]),
+                policy=SchedulePolicy(overlap=ScheduleOverlapPolicy.SKIP)
+            )
+        )
+        print(f"Created schedule {schedule_id} every {every}")
+    except ScheduleAlreadyRunningError:
+        pass
+
+
+async def main() -> None:
+    client = await get_client()
+    await ensure_low_stock_sweep_schedule(client)
+    await ensure_stock_reservation_expiry_schedule(client)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,9 +1,18 @@
+import argparse
 import asyncio
+import multiprocessing
+import signal
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import Dict, Optional, Sequence
 from temporalio.client import Client
-from temporalio.worker import Worker
-from app.workflows.auth_workflow import AuthWorkflow, register_user, authenticate_user
-from app.workflows.order_workflow import (
-    OrderWorkflow,
+from temporalio.worker import Interceptor, Worker
+from temporalio.worker.workflow_sandbox import SandboxedWorkflowRunner, SandboxRestrictions
+from app.workflows.auth_workflow import AuthWorkflow
+from app.workflows.auth_activities import register_user
+from app.workflows.order_workflow import OrderWorkflow
+from app.workflows.order_activities import (
     validate_order, 
     process_payment, 
     ship_order, 
@@ -12,51 +21,310 @@ from app.workflows.order_workflow import (
 from app.workflows.product_workflow import (
     ProductCreateWorkflow,
     ProductStockUpdateWorkflow,
+    ProductInventoryWorkflow,
     ProductInventoryCheckWorkflow,
+    ProductLowStockSweepWorkflow,
+    ProductImportWorkflow,
+    StockReservationExpiryWorkflow
+)
+from app.workflows.product_activities import (
     create_product,
     update_product_stock,
-    check_low_stock_products
+    apply_product_stock_deltas,
+    check_low_stock_products,
+    release_expired_stock_reservations,
+    begin_low_stock_sweep,
+    plan_low_stock_pages,
+    scan_low_stock_page,
+    save_low_stock_sweep_watermark,
+    import_product_chunks,
+    fail_product_import
 )
-from app.db.database import SessionLocal
+from app.workers.client import LEGACY_TASK_QUEUE, TASK_QUEUES
+from app.workers.schedules import ensure_low_stock_sweep_schedule, ensure_stock_reservation_expiry_schedule
+from app.core.codec import create_data_converter
+from app.core.metrics import ActivityMetricsInterceptor, create_temporal_runtime
+from prometheus_client import start_http_server
 from dotenv import load_dotenv
 import os
 
 load_dotenv('../.env')
 print('TEMPORAL_SERVER_URL', os.getenv("TEMPORAL_SERVER_URL"))
 
-async def main():
-    client = await Client.connect(os.getenv("TEMPORAL_SERVER_URL"))
-    
-    # Create a worker instance
-    worker = Worker(
-        client,
-        task_queue="workflow-queue",
-        workflows=[
-            AuthWorkflow, 
-            OrderWorkflow, 
-            ProductCreateWorkflow,
-            ProductStockUpdateWorkflow,
-            ProductInventoryCheckWorkflow
-        ],
-        activities=[
-            # Auth workflow activities
-            register_user, 
-            authenticate_user,
-            # Order workflow activities
+# Workflow và activity của từng domain, mỗi domain chạy trên task queue riêng
+DOMAINS = {
+    "auth": {
+        "workflows": [AuthWorkflow],
+        "activities": [register_user],
+    },
+    "order": {
+        "workflows": [OrderWorkflow],
+        "activities": [
             validate_order,
             process_payment,
             ship_order,
             send_confirmation,
-            # Product management activities
+        ],
+    },
+    "product": {
+        "workflows": [
+            ProductCreateWorkflow,
+            ProductStockUpdateWorkflow,
+            ProductInventoryWorkflow,
+            ProductInventoryCheckWorkflow,
+            ProductLowStockSweepWorkflow,
+            ProductImportWorkflow,
+            StockReservationExpiryWorkflow,
+        ],
+        "activities": [
             create_product,
             update_product_stock,
-            check_low_stock_products
-        ]
+            apply_product_stock_deltas,
+            check_low_stock_products,
+            release_expired_stock_reservations,
+            begin_low_stock_sweep,
+            plan_low_stock_pages,
+            scan_low_stock_page,
+            save_low_stock_sweep_watermark,
+            import_product_chunks,
+            fail_product_import,
+        ],
+    },
+}
+
+# Toàn bộ workflow và activity (dùng khi chạy tất cả trên một queue)
+WORKFLOWS = [wf for domain in DOMAINS.values() for wf in domain["workflows"]]
+ACTIVITIES = [act for domain in DOMAINS.values() for act in domain["activities"]]
+
+# Module nặng hoặc không liên quan tới logic workflow được nạp một lần và dùng
+# chung giữa các lần chạy workflow thay vì import lại trong sandbox mỗi lần
+SANDBOX_PASSTHROUGH_MODULES = (
+    "sqlalchemy",
+    "pydantic",
+    "prometheus_client",
+    "app.core",
+    "app.db",
+    "app.models",
+    "app.schemas",
+    "app.workflows.auth_activities",
+    "app.workflows.order_activities",
+    "app.workflows.product_activities",
+)
+WORKFLOW_RUNNER = SandboxedWorkflowRunner(
+    restrictions=SandboxRestrictions.default.with_passthrough_modules(*SANDBOX_PASSTHROUGH_MODULES)
+)
+
+# Các tham số concurrency của Worker có thể cấu hình qua env/CLI
+WORKER_OPTIONS = (
+    "max_concurrent_activities",
+    "max_concurrent_workflow_tasks",
+    "max_concurrent_workflow_task_polls",
+    "max_concurrent_activity_task_polls",
+    "max_cached_workflows",
+)
+
+def worker_options(domain: str, overrides: Optional[Dict[str, Optional[int]]] = None) -> Dict[str, int]:
+    """
+    Tham số cho Worker của domain, ưu tiên: CLI > <DOMAIN>_<OPTION> > WORKER_<OPTION>.
+    Tham số không được cấu hình dùng giá trị mặc định của SDK.
+    """
+    overrides = overrides or {}
+    options = {}
+    for name in WORKER_OPTIONS:
+        value = overrides.get(name)
+        if value is None:
+            value = os.getenv(f"{domain.upper()}_{name.upper()}") or os.getenv(f"WORKER_{name.upper()}")
+        if value is not None:
+            options[name] = int(value)
+    return options
+
+def create_worker(
+    client: Client,
+    domain: str,
+    task_queue: Optional[str] = None,
+    interceptors: Sequence[Interceptor] = (),
+    overrides: Optional[Dict[str, Optional[int]]] = None,
+    activity_executor: Optional[ThreadPoolExecutor] = None,
+    graceful_shutdown_timeout: timedelta = timedelta()
+) -> Worker:
+    return Worker(
+        client,
+        task_queue=task_queue or TASK_QUEUES[domain],
+        workflows=DOMAINS[domain]["workflows"],
+        activities=DOMAINS[domain]["activities"],
+        interceptors=[ActivityMetricsInterceptor(), *interceptors],
+        activity_executor=activity_executor,
+        graceful_shutdown_timeout=graceful_shutdown_timeout,
+        workflow_runner=WORKFLOW_RUNNER,
+        **worker_options(domain, overrides)
+    )
+
+def create_legacy_worker(
+    client: Client,
+    interceptors: Sequence[Interceptor] = (),
+    graceful_shutdown_timeout: timedelta = timedelta()
+) -> Worker:
+    """
+    Worker chạy mọi workflow và activity trên LEGACY_TASK_QUEUE, để workflow start
+    trước khi tách queue theo domain (và activity của chúng) không bị bỏ dở
+    """
+    return Worker(
+        client,
+        task_queue=LEGACY_TASK_QUEUE,
+        workflows=WORKFLOWS,
+        activities=ACTIVITIES,
+        interceptors=[ActivityMetricsInterceptor(), *interceptors],
+        graceful_shutdown_timeout=graceful_shutdown_timeout,
+        workflow_runner=WORKFLOW_RUNNER
     )
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Temporal worker")
+    parser.add_argument(
+        "--domains", nargs="+", choices=list(DOMAINS), default=list(DOMAINS),
+        help="các domain (task queue) mà process này xử lý"
+    )
+    parser.add_argument(
+        "--processes", type=int, default=int(os.getenv("WORKER_PROCESSES", str(os.cpu_count() or 1))),
+        help="số worker process cùng poll các queue (mặc định: số CPU)"
+    )
+    parser.add_argument(
+        "--activity-threads", type=int, default=int(os.getenv("WORKER_ACTIVITY_THREADS", "0")),
+        help="kích thước thread pool cho activity sync trong mỗi process (0: không dùng)"
+    )
+    parser.add_argument(
+        "--graceful-shutdown-seconds", type=float,
+        default=float(os.getenv("WORKER_GRACEFUL_SHUTDOWN_SECONDS", "30")),
+        help="thời gian chờ activity đang chạy hoàn thành khi nhận SIGTERM"
+    )
+    for name in WORKER_OPTIONS:
+        parser.add_argument(f"--{name.replace('_', '-')}", dest=name, type=int)
+    return parser.parse_args(argv)
+
+# Số port metrics của mỗi worker process (prometheus_client và Temporal SDK)
+METRICS_PORT_STRIDE = 2
+
+def _offset_address(address: str, offset: int) -> str:
+    host, port = address.rsplit(":", 1)
+    return f"{host}:{int(port) + offset}"
+
+async def main(args: argparse.Namespace, process_index: int = 0):
+    # Metrics của activity/database (prometheus_client) và của Temporal SDK
+    # (workflow end-to-end latency, schedule-to-start, sticky cache...) trên hai port riêng.
+    # Mỗi process dùng hai port nên port cơ sở + 2 * process_index: với mặc định
+    # 9100/9101, process 1 dùng 9102/9103 và không trùng exporter của process 0
+    port_offset = METRICS_PORT_STRIDE * process_index
+    start_http_server(int(os.getenv("WORKER_METRICS_PORT", "9100")) + port_offset)
+    runtime = create_temporal_runtime(
+        _offset_address(os.getenv("TEMPORAL_METRICS_ADDRESS", "0.0.0.0:9101"), port_offset)
+    )
+
+    # Data converter phải giống API client (app.workers.client) để hai phía đọc được payload của nhau
+    client = await Client.connect(
+        os.getenv("TEMPORAL_SERVER_URL"),
+        runtime=runtime,
+        data_converter=create_data_converter()
+    )
+    
+    # Các schedule của domain product được tạo một lần bởi process đầu tiên chạy domain này
+    if process_index == 0 and "product" in args.domains:
+        await ensure_low_stock_sweep_schedule(client)
+        await ensure_stock_reservation_expiry_schedule(client)
+
+    # Một Worker cho mỗi domain, dùng chung kết nối tới Temporal
+    overrides = {name: getattr(args, name) for name in WORKER_OPTIONS}
+    activity_executor = ThreadPoolExecutor(args.activity_threads) if args.activity_threads else None
+    workers = [
+        create_worker(
+            client,
+            domain,
+            overrides=overrides,
+            activity_executor=activity_executor,
+            graceful_shutdown_timeout=timedelta(seconds=args.graceful_shutdown_seconds)
+        )
+        for domain in args.domains
+    ]
+    domains = list(args.domains)
+    # Queue chung cũ chỉ cần một process poll cho đến khi hết workflow
+    if process_index == 0 and LEGACY_TASK_QUEUE and LEGACY_TASK_QUEUE not in TASK_QUEUES.values():
+        workers.append(create_legacy_worker(
+            client, graceful_shutdown_timeout=timedelta(seconds=args.graceful_shutdown_seconds)
+        ))
+        domains.append("legacy")
+    
+    # SIGTERM/SIGINT: ngừng poll task mới và chờ activity đang chạy hoàn thành
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop.set)
     
     # Start the worker
-    print("Starting worker...")
-    await worker.run()
+    for domain, worker in zip(domains, workers):
+        print(f"[{process_index}] Starting {domain} worker on {worker.task_queue}...")
+    run_tasks = [asyncio.create_task(worker.run()) for worker in workers]
+    stop_task = asyncio.create_task(stop.wait())
+    await asyncio.wait([stop_task, *run_tasks], return_when=asyncio.FIRST_COMPLETED)
+    
+    print(f"[{process_index}] Shutting down workers...")
+    await asyncio.gather(*(worker.shutdown() for worker in workers), return_exceptions=True)
+    stop_task.cancel()
+    if activity_executor is not None:
+        activity_executor.shutdown(wait=True)
+    
+    # Worker dừng vì lỗi (không phải do tín hiệu) thì raise để supervisor khởi động lại
+    for task in run_tasks:
+        if task.done() and not task.cancelled() and task.exception() is not None:
+            raise task.exception()
+
+def _run_process(args: argparse.Namespace, process_index: int) -> None:
+    asyncio.run(main(args, process_index))
+
+def supervise(args: argparse.Namespace) -> None:
+    """
+    Chạy args.processes worker process, khởi động lại process bị crash và
+    chuyển SIGTERM/SIGINT cho các process con để chúng dừng có kiểm soát
+    """
+    # spawn thay vì fork: Temporal runtime không dùng được qua fork
+    context = multiprocessing.get_context("spawn")
+    stopping = False
+
+    def start(index: int):
+        process = context.Process(target=_run_process, args=(args, index), name=f"worker-{index}")
+        process.start()
+        return process, time.monotonic()
+
+    children = {index: start(index) for index in range(args.processes)}
+
+    def forward(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for process, _ in children.values():
+            if process.is_alive():
+                os.kill(process.pid, signum)
+
+    signal.signal(signal.SIGTERM, forward)
+    signal.signal(signal.SIGINT, forward)
+
+    while children:
+        for index, (process, started_at) in list(children.items()):
+            if process.is_alive():
+                continue
+            process.join()
+            if stopping:
+                del children[index]
+                continue
+            print(f"Worker process {index} exited with code {process.exitcode}, restarting...")
+            # Tránh khởi động lại liên tục khi process crash ngay lúc khởi động
+            if time.monotonic() - started_at < 5:
+                time.sleep(5)
+            children[index] = start(index)
+        time.sleep(0.5)
+
+def run(args: argparse.Namespace) -> None:
+    if args.processes <= 1:
+        _run_process(args, 0)
+    else:
+        supervise(args)
 
 if __name__ == "__main__":
-    asyncio.run(main()) 
\ No newline at end of file
+    run(parse_args())
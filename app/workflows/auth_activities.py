@@ -0,0 +1,33 @@
+from temporalio import activity
+from typing import Dict, Any
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from app.core.security import get_password_hash_async, verify_and_update_password_async
+from app.models.user import User
+from app.db.database import AsyncSessionLocal
+
+@activity.defn
+async def register_user(user_data: Dict[str, Any]) -> Dict[str, Any]:
+    # Hash mật khẩu trong process pool, không chặn event loop của worker
+    hashed_password = await get_password_hash_async(user_data["password"])
+
+    async with AsyncSessionLocal() as db:
+        db_user = User(
+            email=user_data["email"],
+            username=user_data["username"],
+            hashed_password=hashed_password
+        )
+        db.add(db_user)
+        try:
+            await db.commit()
+        except IntegrityError:
+            await db.rollback()
+            # Lần thử trước của activity có thể đã commit rồi bị timeout: user đã có
+            # cùng username, email và mật khẩu là kết quả của chính request này
+            existing = await db.scalar(select(User).where(User.username == user_data["username"]))
+            if existing is not None and existing.email == user_data["email"]:
+                valid, _ = await verify_and_update_password_async(user_data["password"], existing.hashed_password)
+                if valid:
+                    return {"success": True, "user_id": existing.id, "username": existing.username}
+            return {"success": False, "reason": "Email or username already registered"}
+        return {"success": True, "user_id": db_user.id, "username": db_user.username}
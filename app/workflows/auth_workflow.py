@@ -1,55 +1,21 @@
 from datetime import timedelta
-from temporalio import workflow, activity
-from app.core.security import get_password_hash, verify_password, create_access_token
-from app.schemas.user import UserCreate, Token
-from app.models.user import User
-from sqlalchemy.orm import Session
+from temporalio import workflow
+from temporalio.common import RetryPolicy
+from typing import Dict, Any
 
-@activity.defn
-async def register_user(db: Session, user: UserCreate) -> User:
-    db_user = User(
-        email=user.email,
-        username=user.username,
-        hashed_password=get_password_hash(user.password)
-    )
-    db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
-    return db_user
-
-@activity.defn
-async def authenticate_user(db: Session, username: str, password: str) -> User | None:
-    user = db.query(User).filter(User.username == username).first()
-    if not user or not verify_password(password, user.hashed_password):
-        return None
-    return user
+# Activity (SQLAlchemy, cryptography, ...) được import một lần ngoài sandbox,
+# sandbox của workflow chỉ nạp lại module nhẹ này
+with workflow.unsafe.imports_passed_through():
+    from app.workflows.auth_activities import register_user
 
 @workflow.defn
 class AuthWorkflow:
     @workflow.run
-    async def run(self, db: Session, user_data: UserCreate) -> Token:
+    async def run(self, user_data: Dict[str, Any]) -> Dict[str, Any]:
         # Register user
-        user = await workflow.execute_activity(
+        return await workflow.execute_activity(
             register_user,
-            args=[db, user_data],
-            start_to_close_timeout=timedelta(seconds=10)
-        )
-        
-        # Authenticate user
-        authenticated_user = await workflow.execute_activity(
-            authenticate_user,
-            args=[db, user_data.username, user_data.password],
-            start_to_close_timeout=timedelta(seconds=10)
-        )
-        
-        if not authenticated_user:
-            raise ValueError("Authentication failed")
-            
-        # Create access token
-        access_token_expires = timedelta(minutes=30)
-        access_token = create_access_token(
-            data={"sub": authenticated_user.username},
-            expires_delta=access_token_expires
+            args=[user_data],
+            start_to_close_timeout=timedelta(seconds=10),
+            retry_policy=RetryPolicy(maximum_attempts=5)
         )
-        
-        return Token(access_token=access_token, token_type="bearer") 
\ No newline at end of file
@@ -0,0 +1,115 @@
+from temporalio import activity
+from typing import Dict, Any
+from app.models.order import OrderStatus, FailureReason
+from app.db.database import AsyncSessionLocal
+from app.db.transitions import transition_order
+from app.db.inventory import find_product_id, reserve_stock, release_reservation, commit_reservation
+
+# Activities
+
+@activity.defn
+async def validate_order(order_id: int) -> Dict[str, Any]:
+    """
+    Validates the order by checking inventory, address, and price
+    """
+    print(f"Validating order {order_id}")
+    
+    async with AsyncSessionLocal() as db:
+        # Cập nhật trạng thái và lấy dữ liệu đơn hàng trong cùng một câu lệnh
+        result = await transition_order(db, order_id, OrderStatus.VALIDATING)
+        if not result["success"]:
+            return result
+        order = result["order"]
+        
+        # Kiểm tra inventory (mô phỏng)
+        has_inventory = order.quantity <= 100  # giả định tối đa 100 sản phẩm
+        
+        # Kiểm tra địa chỉ (mô phỏng)
+        has_valid_address = len(order.shipping_address) > 10
+        
+        # Kiểm tra giá (mô phỏng)
+        is_price_valid = order.price > 0 and order.total_amount == order.price * order.quantity
+        
+        # Giữ hàng trong kho nếu sản phẩm có trong catalog
+        if has_inventory and has_valid_address and is_price_valid:
+            product_id = await find_product_id(db, order.product_name)
+            if product_id is not None:
+                reservation = await reserve_stock(db, order_id, product_id, order.quantity)
+                has_inventory = reservation["success"]
+        
+        if not has_inventory or not has_valid_address or not is_price_valid:
+            await transition_order(db, order_id, OrderStatus.FAILED, FailureReason.VALIDATION_FAILED)
+            return {
+                "success": False, 
+                "reason": "Validation failed: " + 
+                        (f"Insufficient inventory. " if not has_inventory else "") +
+                        (f"Invalid address. " if not has_valid_address else "") +
+                        (f"Invalid price. " if not is_price_valid else "")
+            }
+        
+        return {"success": True}
+
+@activity.defn
+async def process_payment(order_id: int) -> Dict[str, Any]:
+    """
+    Processes the payment for the order
+    """
+    print(f"Processing payment for order {order_id}")
+    
+    async with AsyncSessionLocal() as db:
+        result = await transition_order(db, order_id, OrderStatus.PROCESSING_PAYMENT)
+        if not result["success"]:
+            return result
+        order = result["order"]
+        
+        # Mô phỏng xử lý thanh toán (thành công nếu tổng tiền < 1000000)
+        payment_success = order.total_amount < 1000000
+        
+        if not payment_success:
+            await transition_order(db, order_id, OrderStatus.FAILED, FailureReason.PAYMENT_FAILED)
+            await release_reservation(db, order_id)
+            return {"success": False, "reason": "Payment failed: Amount too large"}
+        
+        return {"success": True}
+
+@activity.defn
+async def ship_order(order_id: int) -> Dict[str, Any]:
+    """
+    Ships the order to the customer
+    """
+    print(f"Shipping order {order_id}")
+    
+    async with AsyncSessionLocal() as db:
+        result = await transition_order(db, order_id, OrderStatus.SHIPPING)
+        if not result["success"]:
+            return result
+        order = result["order"]
+        
+        # Mô phỏng gửi hàng (thành công nếu địa chỉ có hơn 10 ký tự)
+        shipping_success = len(order.shipping_address) > 10
+        
+        if not shipping_success:
+            await transition_order(db, order_id, OrderStatus.FAILED, FailureReason.SHIPPING_FAILED)
+            await release_reservation(db, order_id)
+            return {"success": False, "reason": "Shipping failed: Invalid address"}
+        
+        return {"success": True}
+
+@activity.defn
+async def send_confirmation(order_id: int) -> Dict[str, Any]:
+    """
+    Sends order confirmation to the customer
+    """
+    print(f"Sending confirmation for order {order_id}")
+    
+    # Mô phỏng gửi xác nhận (luôn thành công) nên đơn hàng chuyển thẳng
+    # sang COMPLETED, không cần ghi trạng thái trung gian SENDING_CONFIRMATION
+    async with AsyncSessionLocal() as db:
+        result = await transition_order(db, order_id, OrderStatus.COMPLETED)
+        if not result["success"]:
+            return result
+        
+        # Lượng hàng đã giữ trở thành hàng đã bán
+        await commit_reservation(db, order_id)
+        
+        return {"success": True}
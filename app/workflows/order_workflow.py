@@ -1,206 +1,145 @@
 from datetime import timedelta
-from temporalio import workflow, activity
-from sqlalchemy.orm import Session
-from typing import Dict, Any, Optional
+from temporalio import workflow
+from temporalio.common import RetryPolicy
+from typing import Dict, Any, List, Optional, Sequence
 
-from app.models.order import Order, OrderStatus, FailureReason
-from app.schemas.order import OrderCreate, OrderResponse
-from app.db.database import SessionLocal
+# Activity (SQLAlchemy, models, ...) được import một lần ngoài sandbox,
+# sandbox của workflow chỉ nạp lại module nhẹ này
+with workflow.unsafe.imports_passed_through():
+    from app.models.order import OrderStatus
+    from app.workflows.order_activities import (
+        validate_order,
+        process_payment,
+        ship_order,
+        send_confirmation
+    )
 
-# Activities
+# Các bước mặc định chạy dạng local activity: kiểm tra mô phỏng, xong trong vài ms.
+# Vận chuyển và gửi xác nhận (dịch vụ bên ngoài) giữ activity thường.
+DEFAULT_LOCAL_STEPS = ("validate_order", "process_payment")
+# History tạo trước khi có local activity vẫn replay theo activity thường
+LOCAL_STEPS_PATCH = "order-local-activity-steps"
 
-@activity.defn
-async def validate_order(order_id: int) -> Dict[str, Any]:
-    """
-    Validates the order by checking inventory, address, and price
-    """
-    print(f"Validating order {order_id}")
-    
-    # Tạo session mới
-    db = SessionLocal()
-    try:
-        # Lấy order từ database
-        order = db.query(Order).filter(Order.id == order_id).first()
-        if not order:
-            return {"success": False, "reason": "Order not found"}
-        
-        # Cập nhật trạng thái
-        order.status = OrderStatus.VALIDATING
-        db.commit()
-        
-        # Kiểm tra inventory (mô phỏng)
-        has_inventory = order.quantity <= 100  # giả định tối đa 100 sản phẩm
-        
-        # Kiểm tra địa chỉ (mô phỏng)
-        has_valid_address = len(order.shipping_address) > 10
-        
-        # Kiểm tra giá (mô phỏng)
-        is_price_valid = order.price > 0 and order.total_amount == order.price * order.quantity
-        
-        if not has_inventory or not has_valid_address or not is_price_valid:
-            order.status = OrderStatus.FAILED
-            order.failure_reason = FailureReason.VALIDATION_FAILED
-            db.commit()
-            return {
-                "success": False, 
-                "reason": "Validation failed: " + 
-                        (f"Insufficient inventory. " if not has_inventory else "") +
-                        (f"Invalid address. " if not has_valid_address else "") +
-                        (f"Invalid price. " if not is_price_valid else "")
-            }
-        
-        return {"success": True}
-    finally:
-        db.close()
-
-@activity.defn
-async def process_payment(order_id: int) -> Dict[str, Any]:
-    """
-    Processes the payment for the order
-    """
-    print(f"Processing payment for order {order_id}")
-    
-    # Tạo session mới
-    db = SessionLocal()
-    try:
-        # Lấy order từ database
-        order = db.query(Order).filter(Order.id == order_id).first()
-        if not order:
-            return {"success": False, "reason": "Order not found"}
-        
-        # Cập nhật trạng thái
-        order.status = OrderStatus.PROCESSING_PAYMENT
-        db.commit()
-        
-        # Mô phỏng xử lý thanh toán (thành công nếu tổng tiền < 1000000)
-        payment_success = order.total_amount < 1000000
-        
-        if not payment_success:
-            order.status = OrderStatus.FAILED
-            order.failure_reason = FailureReason.PAYMENT_FAILED
-            db.commit()
-            return {"success": False, "reason": "Payment failed: Amount too large"}
-        
-        return {"success": True}
-    finally:
-        db.close()
+REMOTE_STEP_TIMEOUT = timedelta(seconds=10)
+# Local activity retry nhanh trong worker; quá LOCAL_RETRY_THRESHOLD thì
+# lần thử tiếp theo được hẹn bằng timer của workflow
+LOCAL_STEP_TIMEOUT = timedelta(seconds=5)
+LOCAL_STEP_SCHEDULE_TO_CLOSE_TIMEOUT = timedelta(seconds=30)
+LOCAL_RETRY_THRESHOLD = timedelta(seconds=10)
+LOCAL_STEP_RETRY_POLICY = RetryPolicy(
+    initial_interval=timedelta(milliseconds=100),
+    backoff_coefficient=2.0,
+    maximum_interval=timedelta(seconds=2),
+    maximum_attempts=10
+)
 
-@activity.defn
-async def ship_order(order_id: int) -> Dict[str, Any]:
+def order_workflow_id(order_id: int) -> str:
     """
-    Ships the order to the customer
+    ID cố định theo đơn hàng để API tìm lại workflow (query tiến trình)
     """
-    print(f"Shipping order {order_id}")
-    
-    # Tạo session mới
-    db = SessionLocal()
-    try:
-        # Lấy order từ database
-        order = db.query(Order).filter(Order.id == order_id).first()
-        if not order:
-            return {"success": False, "reason": "Order not found"}
-        
-        # Cập nhật trạng thái
-        order.status = OrderStatus.SHIPPING
-        db.commit()
-        
-        # Mô phỏng gửi hàng (thành công nếu địa chỉ có hơn 10 ký tự)
-        shipping_success = len(order.shipping_address) > 10
-        
-        if not shipping_success:
-            order.status = OrderStatus.FAILED
-            order.failure_reason = FailureReason.SHIPPING_FAILED
-            db.commit()
-            return {"success": False, "reason": "Shipping failed: Invalid address"}
-        
-        return {"success": True}
-    finally:
-        db.close()
-
-@activity.defn
-async def send_confirmation(order_id: int) -> Dict[str, Any]:
-    """
-    Sends order confirmation to the customer
-    """
-    print(f"Sending confirmation for order {order_id}")
-    
-    # Tạo session mới
-    db = SessionLocal()
-    try:
-        # Lấy order từ database
-        order = db.query(Order).filter(Order.id == order_id).first()
-        if not order:
-            return {"success": False, "reason": "Order not found"}
-        
-        # Cập nhật trạng thái
-        order.status = OrderStatus.SENDING_CONFIRMATION
-        db.commit()
-        
-        # Mô phỏng gửi xác nhận (luôn thành công)
-        
-        # Đánh dấu đơn hàng đã hoàn thành
-        order.status = OrderStatus.COMPLETED
-        db.commit()
-        
-        return {"success": True}
-    finally:
-        db.close()
+    return f"order-workflow-{order_id}"
 
 @workflow.defn
 class OrderWorkflow:
     def __init__(self):
         self.order_id: Optional[int] = None
-    
+        # Trạng thái hiện tại và thời gian từng bước, đọc qua query get_progress
+        self.status: str = OrderStatus.RECEIVED.value
+        self.failure_reason: Optional[str] = None
+        self.steps: List[Dict[str, Any]] = []
+        self.local_steps: Sequence[str] = ()
+
     @workflow.run
-    async def run(self, order_id: int) -> Dict[str, Any]:
+    async def run(self, order_id: int, local_steps: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        local_steps: tên activity chạy dạng local activity, None để dùng DEFAULT_LOCAL_STEPS,
+        [] để mọi bước là activity thường
+        """
         self.order_id = order_id
-        
+        if workflow.patched(LOCAL_STEPS_PATCH):
+            self.local_steps = DEFAULT_LOCAL_STEPS if local_steps is None else local_steps
+
         # Step 1: Validate Order
-        validation_result = await workflow.execute_activity(
-            validate_order,
-            args=[order_id],
-            start_to_close_timeout=timedelta(seconds=10)
-        )
-        
+        validation_result = await self._run_step(validate_order, OrderStatus.VALIDATING)
+
         if not validation_result["success"]:
             # Order failed validation
             print(f"Order {order_id} failed validation: {validation_result['reason']}")
-            return {"success": False, "reason": validation_result['reason']}
-        
+            return self._fail(validation_result["reason"])
+
         # Step 2: Process Payment
-        payment_result = await workflow.execute_activity(
-            process_payment,
-            args=[order_id],
-            start_to_close_timeout=timedelta(seconds=10)
-        )
-        
+        payment_result = await self._run_step(process_payment, OrderStatus.PROCESSING_PAYMENT)
+
         if not payment_result["success"]:
             # Payment failed
             print(f"Order {order_id} payment failed: {payment_result['reason']}")
-            return {"success": False, "reason": payment_result['reason']}
-        
+            return self._fail(payment_result["reason"])
+
         # Step 3: Ship Order
-        shipping_result = await workflow.execute_activity(
-            ship_order,
-            args=[order_id],
-            start_to_close_timeout=timedelta(seconds=10)
-        )
-        
+        shipping_result = await self._run_step(ship_order, OrderStatus.SHIPPING)
+
         if not shipping_result["success"]:
             # Shipping failed
             print(f"Order {order_id} shipping failed: {shipping_result['reason']}")
-            return {"success": False, "reason": shipping_result['reason']}
-        
+            return self._fail(shipping_result["reason"])
+
         # Step 4: Send Confirmation
-        confirmation_result = await workflow.execute_activity(
-            send_confirmation,
-            args=[order_id],
-            start_to_close_timeout=timedelta(seconds=10)
-        )
-        
+        confirmation_result = await self._run_step(send_confirmation, OrderStatus.SENDING_CONFIRMATION)
+
         if not confirmation_result["success"]:
             # Confirmation failed (không cần cập nhật trạng thái thất bại vì đã thành công đến bước này)
             print(f"Order {order_id} confirmation failed but order is still completed")
-        
+
         # Order completed successfully
+        self.status = OrderStatus.COMPLETED.value
         return {"success": True}
+
+    async def _run_step(self, step_activity, step_status: OrderStatus) -> Dict[str, Any]:
+        step = {
+            "status": step_status.value,
+            "started_at": workflow.now().isoformat(),
+            "completed_at": None,
+            "success": None,
+        }
+        self.status = step_status.value
+        self.steps.append(step)
+
+        if step_activity.__name__ in self.local_steps:
+            # Chạy ngay trong worker đang xử lý workflow task: không qua task queue,
+            # chỉ ghi một marker vào history
+            result = await workflow.execute_local_activity(
+                step_activity,
+                args=[self.order_id],
+                start_to_close_timeout=LOCAL_STEP_TIMEOUT,
+                schedule_to_close_timeout=LOCAL_STEP_SCHEDULE_TO_CLOSE_TIMEOUT,
+                local_retry_threshold=LOCAL_RETRY_THRESHOLD,
+                retry_policy=LOCAL_STEP_RETRY_POLICY
+            )
+        else:
+            result = await workflow.execute_activity(
+                step_activity,
+                args=[self.order_id],
+                start_to_close_timeout=REMOTE_STEP_TIMEOUT
+            )
+
+        step["completed_at"] = workflow.now().isoformat()
+        step["success"] = result["success"]
+        return result
+
+    def _fail(self, reason: str) -> Dict[str, Any]:
+        self.status = OrderStatus.FAILED.value
+        self.failure_reason = reason
+        return {"success": False, "reason": reason}
+
+    @workflow.query
+    def get_progress(self) -> Dict[str, Any]:
+        """
+        Trạng thái hiện tại và thời gian bắt đầu/kết thúc của từng bước
+        """
+        return {
+            "order_id": self.order_id,
+            "status": self.status,
+            "failure_reason": self.failure_reason,
+            "steps": self.steps,
+            "done": self.status in (OrderStatus.COMPLETED.value, OrderStatus.FAILED.value),
+        }
@@ -0,0 +1,250 @@
+import os
+from temporalio import activity
+from temporalio.exceptions import ApplicationError
+from typing import Dict, Any, List, Optional
+from sqlalchemy import select, update
+from app.models.product import Product, ProductCategory, ProductImport, ProductImportChunk, ProductImportStatus
+from app.db.database import AsyncSessionLocal
+from app.db.inventory import adjust_stock, apply_stock_deltas, release_expired_reservations
+from app.db.product_cache import mark_products_changed
+from app.db import product_import, sweep
+
+# Số sản phẩm mỗi lần đọc trong một trang của lần quét tồn kho thấp (heartbeat sau mỗi lô)
+SWEEP_BATCH_SIZE = int(os.getenv("LOW_STOCK_SWEEP_BATCH_SIZE", "200"))
+
+# Activities
+
+@activity.defn
+async def create_product(product_data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Tạo sản phẩm mới trong hệ thống
+    """
+    print(f"Creating new product: {product_data['name']}")
+    
+    async with AsyncSessionLocal() as db:
+        try:
+            # Tạo sản phẩm
+            product = Product(
+                name=product_data["name"],
+                description=product_data["description"],
+                price=product_data["price"],
+                stock_quantity=product_data.get("stock_quantity", 0),
+                category=product_data.get("category", ProductCategory.OTHER)
+            )
+            
+            db.add(product)
+            await db.flush()
+            mark_products_changed(db, [product.id])
+            await db.commit()
+            
+            return {
+                "success": True,
+                "product_id": product.id
+            }
+        except Exception as e:
+            await db.rollback()
+            return {
+                "success": False,
+                "reason": f"Failed to create product: {str(e)}"
+            }
+
+@activity.defn
+async def update_product_stock(product_id: int, quantity_change: int) -> Dict[str, Any]:
+    """
+    Cập nhật số lượng tồn kho của sản phẩm
+    """
+    print(f"Updating stock for product {product_id} by {quantity_change}")
+    
+    async with AsyncSessionLocal() as db:
+        try:
+            # Cập nhật nguyên tử, từ chối nếu tồn kho sau cập nhật bị âm
+            return await adjust_stock(db, product_id, quantity_change)
+        except Exception as e:
+            await db.rollback()
+            return {"success": False, "reason": f"Failed to update stock: {str(e)}"}
+
+@activity.defn
+async def apply_product_stock_deltas(product_id: int, deltas: List[int], batch_id: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Ghi một lô thay đổi tồn kho đã gộp của sản phẩm trong một lần ghi.
+    Lần thử lại với cùng batch_id không ghi lô lần nữa.
+    """
+    print(f"Applying {len(deltas)} stock changes to product {product_id}")
+    
+    async with AsyncSessionLocal() as db:
+        return await apply_stock_deltas(db, product_id, deltas, batch_id)
+
+@activity.defn
+async def release_expired_stock_reservations() -> Dict[str, Any]:
+    """
+    Hoàn trả tồn kho của các lượt giữ hàng đã hết hạn
+    """
+    async with AsyncSessionLocal() as db:
+        released = await release_expired_reservations(db)
+        await db.commit()
+        return {"success": True, "released_count": released}
+
+@activity.defn
+async def check_low_stock_products(threshold: int = 10) -> Dict[str, Any]:
+    """
+    Kiểm tra và báo cáo các sản phẩm có lượng tồn kho thấp
+    """
+    print(f"Checking products with stock below {threshold}")
+    
+    async with AsyncSessionLocal() as db:
+        low_stock_products = (await db.scalars(
+            select(Product).filter(
+                Product.stock_quantity < threshold,
+                Product.is_active == True
+            )
+        )).all()
+        
+        result = []
+        for product in low_stock_products:
+            result.append({
+                "id": product.id,
+                "name": product.name,
+                "current_stock": product.stock_quantity
+            })
+        
+        return {
+            "success": True,
+            "low_stock_count": len(result),
+            "products": result
+        }
+
+@activity.defn
+async def begin_low_stock_sweep(name: str, incremental: bool) -> Dict[str, Any]:
+    """
+    Chốt khoảng updated_at mà lần quét tồn kho thấp sẽ xem
+    """
+    async with AsyncSessionLocal() as db:
+        return await sweep.begin_sweep(db, name, incremental)
+
+@activity.defn
+async def plan_low_stock_pages(
+    threshold: int,
+    since: Optional[str],
+    until: Optional[str],
+    after_id: int,
+    page_size: int,
+    max_pages: int
+) -> List[int]:
+    """
+    Id cuối của các trang tiếp theo của lần quét tồn kho thấp
+    """
+    async with AsyncSessionLocal() as db:
+        return await sweep.plan_pages(db, threshold, since, until, after_id, page_size, max_pages)
+
+@activity.defn
+async def scan_low_stock_page(
+    threshold: int,
+    since: Optional[str],
+    until: Optional[str],
+    after_id: int,
+    last_id: Optional[int],
+    max_reported: int
+) -> Dict[str, Any]:
+    """
+    Quét một trang (after_id, last_id] theo keyset, heartbeat sau mỗi lô.
+    Khi được retry, tiếp tục từ vị trí trong heartbeat thay vì quét lại từ đầu.
+    Chỉ trả về max_reported sản phẩm tồn kho thấp nhất để kết quả luôn nhỏ.
+    """
+    progress = {"after_id": after_id, "low_stock_count": 0, "products": []}
+    details = activity.info().heartbeat_details
+    if details:
+        progress = details[0]
+
+    async with AsyncSessionLocal() as db:
+        while True:
+            rows = await sweep.scan_page(
+                db, threshold, since, until, progress["after_id"], last_id, SWEEP_BATCH_SIZE
+            )
+            if not rows:
+                break
+            progress["after_id"] = rows[-1]["id"]
+            progress["low_stock_count"] += len(rows)
+            progress["products"] = lowest_stock(progress["products"] + rows, max_reported)
+            activity.heartbeat(progress)
+            if len(rows) < SWEEP_BATCH_SIZE:
+                break
+
+    return {"low_stock_count": progress["low_stock_count"], "products": progress["products"]}
+
+@activity.defn
+async def save_low_stock_sweep_watermark(name: str, watermark: Optional[str]) -> None:
+    async with AsyncSessionLocal() as db:
+        await sweep.save_watermark(db, name, watermark)
+
+def lowest_stock(products: List[Dict[str, Any]], limit: int) -> List[Dict[str, Any]]:
+    return sorted(products, key=lambda product: (product["current_stock"], product["id"]))[:limit]
+
+@activity.defn
+async def import_product_chunks(import_id: str) -> Dict[str, Any]:
+    """
+    Ghi các chunk đã validate của một lần import, mỗi chunk một transaction gồm
+    cả các dòng sản phẩm và tiến độ (committed_chunks). Heartbeat sau mỗi chunk;
+    khi activity chạy lại sau khi worker chết, tiếp tục từ chunk chưa commit.
+    """
+    async with AsyncSessionLocal() as db:
+        job = await db.get(ProductImport, import_id)
+        if job is None:
+            return {"success": False, "reason": f"Import {import_id} not found"}
+        total_chunks = job.total_chunks
+        print(f"Importing products {import_id}: chunk {job.committed_chunks}/{total_chunks}")
+
+        index = job.committed_chunks
+        while index < total_chunks:
+            rows = await product_import.read_chunk(db, import_id, index)
+            # Cập nhật tiến độ trước để COPY chạy trong transaction đã mở. Chỉ cập nhật
+            # khi chunk chưa được commit: lần thử trước của activity (quá heartbeat timeout
+            # nhưng vẫn chạy) có thể đang ghi hoặc đã ghi cùng chunk, khi đó bỏ qua
+            claimed = rows is not None and (await db.execute(
+                update(ProductImport)
+                .where(ProductImport.id == import_id, ProductImport.committed_chunks == index)
+                .values(
+                    status=ProductImportStatus.RUNNING.value,
+                    committed_chunks=index + 1,
+                    imported_rows=ProductImport.imported_rows + len(rows)
+                )
+            )).rowcount > 0
+            if not claimed:
+                await db.rollback()
+                committed_chunks = (await db.get(ProductImport, import_id, populate_existing=True)).committed_chunks
+                if committed_chunks == index:
+                    # Chunk chưa ghi nhưng không còn trong database (import đã bị huỷ)
+                    raise ApplicationError(f"Chunk {index} of import {import_id} is missing", non_retryable=True)
+                index = committed_chunks
+                continue
+            await product_import.insert_product_rows(db, rows)
+            await db.execute(
+                product_import.delete_chunks_statement(import_id)
+                .where(ProductImportChunk.chunk_index == index)
+            )
+            # Xoá các trang danh sách đã cache sau khi commit
+            mark_products_changed(db, [])
+            await db.commit()
+            index += 1
+            activity.heartbeat({"committed_chunks": index, "total_chunks": total_chunks})
+
+        await db.execute(
+            update(ProductImport)
+            .where(ProductImport.id == import_id)
+            .values(status=ProductImportStatus.COMPLETED.value)
+        )
+        await db.commit()
+        imported_rows = (await db.get(ProductImport, import_id, populate_existing=True)).imported_rows
+
+    return {"success": True, "import_id": import_id, "imported_rows": imported_rows}
+
+@activity.defn
+async def fail_product_import(import_id: str) -> None:
+    async with AsyncSessionLocal() as db:
+        await db.execute(
+            update(ProductImport)
+            .where(ProductImport.id == import_id)
+            .values(status=ProductImportStatus.FAILED.value)
+        )
+        # Bỏ các chunk chưa ghi
+        await db.execute(product_import.delete_chunks_statement(import_id))
+        await db.commit()
@@ -1,107 +1,27 @@
+import asyncio
 from datetime import timedelta
-from temporalio import workflow, activity
-from sqlalchemy.orm import Session
+from temporalio import workflow
+from temporalio.common import RetryPolicy
+from temporalio.exceptions import ActivityError
 from typing import Dict, Any, Optional, List
 
-from app.models.product import Product, ProductCategory
-from app.schemas.product import ProductCreate, ProductUpdate, ProductResponse
-from app.db.database import SessionLocal
-
-# Activities
-
-@activity.defn
-async def create_product(product_data: Dict[str, Any]) -> Dict[str, Any]:
-    """
-    Tạo sản phẩm mới trong hệ thống
-    """
-    print(f"Creating new product: {product_data['name']}")
-    
-    db = SessionLocal()
-    try:
-        # Tạo sản phẩm
-        product = Product(
-            name=product_data["name"],
-            description=product_data["description"],
-            price=product_data["price"],
-            stock_quantity=product_data.get("stock_quantity", 0),
-            category=product_data.get("category", ProductCategory.OTHER)
-        )
-        
-        db.add(product)
-        db.commit()
-        db.refresh(product)
-        
-        return {
-            "success": True,
-            "product_id": product.id
-        }
-    except Exception as e:
-        db.rollback()
-        return {
-            "success": False,
-            "reason": f"Failed to create product: {str(e)}"
-        }
-    finally:
-        db.close()
-
-@activity.defn
-async def update_product_stock(product_id: int, quantity_change: int) -> Dict[str, Any]:
-    """
-    Cập nhật số lượng tồn kho của sản phẩm
-    """
-    print(f"Updating stock for product {product_id} by {quantity_change}")
-    
-    db = SessionLocal()
-    try:
-        product = db.query(Product).filter(Product.id == product_id).first()
-        if not product:
-            return {"success": False, "reason": "Product not found"}
-        
-        # Kiểm tra số lượng tồn hợp lệ
-        new_quantity = product.stock_quantity + quantity_change
-        if new_quantity < 0:
-            return {"success": False, "reason": "Insufficient stock"}
-        
-        # Cập nhật số lượng
-        product.stock_quantity = new_quantity
-        db.commit()
-        
-        return {"success": True, "current_stock": new_quantity}
-    except Exception as e:
-        db.rollback()
-        return {"success": False, "reason": f"Failed to update stock: {str(e)}"}
-    finally:
-        db.close()
-
-@activity.defn
-async def check_low_stock_products(threshold: int = 10) -> Dict[str, Any]:
-    """
-    Kiểm tra và báo cáo các sản phẩm có lượng tồn kho thấp
-    """
-    print(f"Checking products with stock below {threshold}")
-    
-    db = SessionLocal()
-    try:
-        low_stock_products = db.query(Product).filter(
-            Product.stock_quantity < threshold,
-            Product.is_active == True
-        ).all()
-        
-        result = []
-        for product in low_stock_products:
-            result.append({
-                "id": product.id,
-                "name": product.name,
-                "current_stock": product.stock_quantity
-            })
-        
-        return {
-            "success": True,
-            "low_stock_count": len(result),
-            "products": result
-        }
-    finally:
-        db.close()
+# Activity (SQLAlchemy, models, ...) được import một lần ngoài sandbox,
+# sandbox của workflow chỉ nạp lại module nhẹ này
+with workflow.unsafe.imports_passed_through():
+    from app.workflows.product_activities import (
+        create_product,
+        update_product_stock,
+        apply_product_stock_deltas,
+        release_expired_stock_reservations,
+        check_low_stock_products,
+        begin_low_stock_sweep,
+        plan_low_stock_pages,
+        scan_low_stock_page,
+        save_low_stock_sweep_watermark,
+        lowest_stock,
+        import_product_chunks,
+        fail_product_import
+    )
 
 # Workflows
 
@@ -134,6 +54,33 @@ class ProductCreateWorkflow:
             "message": f"Product '{product_data['name']}' created successfully"
         }
 
+@workflow.defn
+class ProductImportWorkflow:
+    """
+    Import sản phẩm hàng loạt từ các chunk đã validate bởi POST /api/products/import.
+    Activity ghi chunk có heartbeat nên worker chết được phát hiện sau HEARTBEAT_TIMEOUT
+    và lần thử tiếp theo tiếp tục từ chunk chưa commit.
+    """
+    HEARTBEAT_TIMEOUT = timedelta(minutes=2)
+
+    @workflow.run
+    async def run(self, import_id: str) -> Dict[str, Any]:
+        try:
+            return await workflow.execute_activity(
+                import_product_chunks,
+                args=[import_id],
+                start_to_close_timeout=timedelta(hours=6),
+                heartbeat_timeout=self.HEARTBEAT_TIMEOUT,
+                retry_policy=RetryPolicy(maximum_attempts=20, maximum_interval=timedelta(minutes=1))
+            )
+        except ActivityError as e:
+            await workflow.execute_activity(
+                fail_product_import,
+                args=[import_id],
+                start_to_close_timeout=timedelta(seconds=10)
+            )
+            return {"success": False, "import_id": import_id, "reason": str(e.cause or e)}
+
 @workflow.defn
 class ProductStockUpdateWorkflow:
     def __init__(self):
@@ -177,4 +124,203 @@ class ProductInventoryCheckWorkflow:
             start_to_close_timeout=timedelta(seconds=10)
         )
         
-        return result 
\ No newline at end of file
+        return result
+
+@workflow.defn
+class StockReservationExpiryWorkflow:
+    @workflow.run
+    async def run(self) -> Dict[str, Any]:
+        """
+        Hoàn trả tồn kho của các lượt giữ hàng hết hạn, chạy định kỳ bởi Temporal Schedule
+        """
+        return await workflow.execute_activity(
+            release_expired_stock_reservations,
+            start_to_close_timeout=timedelta(seconds=30)
+        )
+
+@workflow.defn
+class ProductLowStockSweepWorkflow:
+    """
+    Quét sản phẩm tồn kho thấp theo từng trang (keyset theo id) thay vì một activity
+    đọc toàn bộ catalog.
+
+    Mỗi vòng lấy mốc của tối đa PARALLEL_PAGES trang rồi quét các trang song song,
+    mỗi trang một activity có heartbeat. Kết quả được gộp dần (số lượng và
+    MAX_REPORTED_PRODUCTS sản phẩm tồn kho thấp nhất), continue-as-new sau
+    MAX_PAGES_PER_RUN trang để history nhỏ. Ở chế độ incremental chỉ xem sản phẩm
+    có updated_at từ mốc của lần quét trước; mốc mới được lưu khi quét xong.
+    """
+    SWEEP_NAME = "low-stock"
+    PAGE_SIZE = 1000
+    PARALLEL_PAGES = 8
+    MAX_PAGES_PER_RUN = 200
+    MAX_REPORTED_PRODUCTS = 100
+
+    @workflow.run
+    async def run(self, threshold: int = 10, incremental: bool = True, state: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        if state is None:
+            window = await workflow.execute_activity(
+                begin_low_stock_sweep,
+                args=[self.SWEEP_NAME, incremental],
+                start_to_close_timeout=timedelta(seconds=10)
+            )
+            state = {
+                **window,
+                "after_id": 0,
+                "pages": 0,
+                "low_stock_count": 0,
+                "products": [],
+            }
+
+        pages_this_run = 0
+        while True:
+            boundaries = await workflow.execute_activity(
+                plan_low_stock_pages,
+                args=[threshold, state["since"], state["until"], state["after_id"], self.PAGE_SIZE, self.PARALLEL_PAGES],
+                start_to_close_timeout=timedelta(seconds=30)
+            )
+            last_round = len(boundaries) < self.PARALLEL_PAGES
+            # Trang (after_id, mốc]; vòng cuối thêm trang sau mốc cuối cùng
+            ranges = list(zip([state["after_id"], *boundaries], boundaries))
+            if last_round:
+                ranges.append((boundaries[-1] if boundaries else state["after_id"], None))
+
+            results = await asyncio.gather(*(
+                workflow.execute_activity(
+                    scan_low_stock_page,
+                    args=[threshold, state["since"], state["until"], after_id, last_id, self.MAX_REPORTED_PRODUCTS],
+                    start_to_close_timeout=timedelta(minutes=5),
+                    heartbeat_timeout=timedelta(seconds=30)
+                )
+                for after_id, last_id in ranges
+            ))
+            for result in results:
+                state["low_stock_count"] += result["low_stock_count"]
+                state["products"] = lowest_stock(state["products"] + result["products"], self.MAX_REPORTED_PRODUCTS)
+            state["pages"] += len(ranges)
+            pages_this_run += len(ranges)
+
+            if last_round:
+                break
+            state["after_id"] = boundaries[-1]
+            if pages_this_run >= self.MAX_PAGES_PER_RUN or workflow.info().is_continue_as_new_suggested():
+                workflow.continue_as_new(args=[threshold, incremental, state])
+
+        await workflow.execute_activity(
+            save_low_stock_sweep_watermark,
+            args=[self.SWEEP_NAME, state["until"]],
+            start_to_close_timeout=timedelta(seconds=10)
+        )
+        return {
+            "success": True,
+            "since": state["since"],
+            "until": state["until"],
+            "pages": state["pages"],
+            "low_stock_count": state["low_stock_count"],
+            "products": state["products"],
+        }
+
+@workflow.defn
+class ProductInventoryWorkflow:
+    """
+    Workflow thực thể (entity) sống lâu cho tồn kho của một sản phẩm.
+
+    Các thay đổi tồn kho đến qua signal ``adjust_stock`` được gộp lại và ghi
+    xuống database một lần mỗi FLUSH_INTERVAL (hoặc khi đủ MAX_BATCH_SIZE).
+    Kết quả từng thay đổi và tồn kho hiện tại được đọc qua query.
+    """
+    FLUSH_INTERVAL = timedelta(milliseconds=200)
+    MAX_BATCH_SIZE = 500
+    IDLE_TIMEOUT = timedelta(minutes=10)
+    # Giới hạn số lần ghi trong một lần chạy để history không lớn quá
+    MAX_FLUSHES_PER_RUN = 500
+    MAX_KEPT_RESULTS = 1000
+
+    def __init__(self):
+        self.product_id: Optional[int] = None
+        self.current_stock: Optional[int] = None
+        self.pending: List[Dict[str, Any]] = []
+        self.results: Dict[str, Dict[str, Any]] = {}
+        self.flushes = 0
+
+    @workflow.run
+    async def run(self, product_id: int, state: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        self.product_id = product_id
+        if state:
+            self.current_stock = state.get("current_stock")
+            self.pending = state.get("pending", []) + self.pending
+            self.results = {**state.get("results", {}), **self.results}
+
+        while True:
+            # Dừng workflow khi không có thay đổi nào trong thời gian dài,
+            # signal-with-start tiếp theo sẽ khởi động lại
+            try:
+                await workflow.wait_condition(lambda: len(self.pending) > 0, timeout=self.IDLE_TIMEOUT)
+            except asyncio.TimeoutError:
+                return {"product_id": product_id, "current_stock": self.current_stock}
+
+            # Gộp các thay đổi đến trong khoảng FLUSH_INTERVAL
+            try:
+                await workflow.wait_condition(
+                    lambda: len(self.pending) >= self.MAX_BATCH_SIZE,
+                    timeout=self.FLUSH_INTERVAL
+                )
+            except asyncio.TimeoutError:
+                pass
+
+            batch = self.pending[:self.MAX_BATCH_SIZE]
+            self.pending = self.pending[self.MAX_BATCH_SIZE:]
+            await self._flush(batch)
+
+            if self.flushes >= self.MAX_FLUSHES_PER_RUN or workflow.info().is_continue_as_new_suggested():
+                workflow.continue_as_new(args=[product_id, {
+                    "current_stock": self.current_stock,
+                    "pending": self.pending,
+                    "results": self.results,
+                }])
+
+    async def _flush(self, batch: List[Dict[str, Any]]) -> None:
+        # ID của lô duy nhất theo lần chạy và thứ tự ghi: activity retry sau khi
+        # đã commit không cộng/trừ tồn kho lần nữa
+        info = workflow.info()
+        batch_id = f"{info.workflow_id}/{info.run_id}/{self.flushes}"
+        self.flushes += 1
+        result = await workflow.execute_activity(
+            apply_product_stock_deltas,
+            args=[self.product_id, [item["quantity_change"] for item in batch], batch_id],
+            start_to_close_timeout=timedelta(seconds=10)
+        )
+        if result.get("current_stock") is not None:
+            self.current_stock = result["current_stock"]
+
+        for item, item_result in zip(batch, result["results"]):
+            self.results[item["request_id"]] = {
+                **item_result,
+                "current_stock": self.current_stock
+            }
+
+        # Chỉ giữ kết quả của các thay đổi gần nhất
+        while len(self.results) > self.MAX_KEPT_RESULTS:
+            del self.results[next(iter(self.results))]
+
+    @workflow.signal
+    def adjust_stock(self, request_id: str, quantity_change: int) -> None:
+        # Bỏ qua signal trùng lặp (client gửi lại cùng request_id)
+        if request_id in self.results or any(item["request_id"] == request_id for item in self.pending):
+            return
+        self.pending.append({"request_id": request_id, "quantity_change": quantity_change})
+
+    @workflow.query
+    def get_adjustment(self, request_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Kết quả của một thay đổi tồn kho, None nếu chưa được ghi
+        """
+        return self.results.get(request_id)
+
+    @workflow.query
+    def get_stock(self) -> Dict[str, Any]:
+        return {
+            "product_id": self.product_id,
+            "current_stock": self.current_stock,
+            "pending_change": sum(item["quantity_change"] for item in self.pending),
+        }
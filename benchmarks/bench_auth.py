@@ -0,0 +1,79 @@
+"""
+Chi phí xác thực mỗi request ở RPS cao: GET /api/auth/me với Bearer token,
+so với GET / (không xác thực) làm mốc.
+
+- cached: token đã xác thực được lấy từ cache (mặc định)
+- uncached: kiểm tra chữ ký JWT ở mọi request
+- db-lookup: token không có claim uid, không cache: kiểm tra chữ ký và truy vấn users ở mọi request
+
+    python -m benchmarks.bench_auth --requests 20000 --concurrency 100
+"""
+import argparse
+import asyncio
+
+from benchmarks.harness import LatencyRecorder, api_client, print_summary, run_concurrently
+
+BENCH_USERNAME = "bench-auth"
+
+
+def seed() -> int:
+    from app.core.security import get_password_hash
+    from app.db.database import SessionLocal, create_tables
+    from app.models.user import User
+
+    create_tables()
+    db = SessionLocal()
+    try:
+        user = db.query(User).filter(User.username == BENCH_USERNAME).first()
+        if user is None:
+            user = User(email="bench-auth@example.com", username=BENCH_USERNAME, hashed_password=get_password_hash("pw"))
+            db.add(user)
+            db.commit()
+        return user.id
+    finally:
+        db.close()
+
+
+async def main(args):
+    from app.api import authentication
+    from app.core.cache import TTLCache
+    from app.core.security import create_access_token
+
+    user_id = seed()
+    signed_token = create_access_token({"sub": BENCH_USERNAME, "uid": user_id})
+    plain_token = create_access_token({"sub": BENCH_USERNAME})
+    cache = authentication.token_cache
+    no_cache = TTLCache(maxsize=0)
+
+    recorder = LatencyRecorder()
+    async with api_client() as http:
+        async def baseline(i):
+            response = await http.get("/")
+            response.raise_for_status()
+
+        await run_concurrently(recorder, "GET / (no auth)", args.requests, args.concurrency, baseline)
+
+        modes = [
+            ("cached", cache, signed_token),
+            ("uncached", no_cache, signed_token),
+            ("db-lookup", no_cache, plain_token),
+        ]
+        for name, token_cache, token in modes:
+            authentication.token_cache = token_cache
+            headers = {"Authorization": f"Bearer {token}"}
+
+            async def me(i):
+                response = await http.get("/api/auth/me", headers=headers)
+                response.raise_for_status()
+
+            await run_concurrently(recorder, f"GET /api/auth/me ({name})", args.requests, args.concurrency, me)
+        authentication.token_cache = cache
+
+    print_summary(recorder.summary())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    asyncio.run(main(parser.parse_args()))
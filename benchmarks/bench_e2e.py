@@ -0,0 +1,190 @@
+"""
+Benchmark end-to-end cho API + workflow: gọi ứng dụng FastAPI trong process
+qua ASGI transport, với worker Temporal chạy cùng process.
+
+    python -m benchmarks.bench_e2e --requests 200 --concurrency 20 --output bench.json
+    python -m benchmarks.bench_e2e --scenarios login list_products --compare bench.json
+
+Mặc định dùng SQLite tạm và Temporal dev server cục bộ; đặt DATABASE_URL /
+TEMPORAL_SERVER_URL để dùng Postgres hoặc server có sẵn. Kết quả gồm thông lượng
+và p50/p95/p99 theo endpoint, activity và workflow, có thể ghi ra JSON để so sánh
+giữa các commit.
+"""
+import argparse
+import asyncio
+import datetime
+import os
+from contextlib import AsyncExitStack
+
+from benchmarks.harness import (
+    LatencyRecorder,
+    api_client,
+    compare,
+    git_revision,
+    print_summary,
+    run_concurrently,
+    running_worker,
+    temporal_environment,
+    write_json,
+)
+
+ORDER = {
+    "product_name": "Benchmark product",
+    "quantity": 1,
+    "price": 100.0,
+    "shipping_address": "123 Benchmark Street, District 1",
+}
+
+BENCH_USER = {"email": "bench@example.com", "username": "bench", "password": "bench-password"}
+
+# Các kịch bản cần Temporal server và worker
+TEMPORAL_SCENARIOS = {"order_create", "order_workflow", "product_create", "stock_update"}
+ALL_SCENARIOS = [
+    "order_create",
+    "order_workflow",
+    "product_create",
+    "stock_update",
+    "login",
+    "list_orders",
+    "list_products",
+]
+
+
+def seed(products: int) -> list:
+    from app.core.security import get_password_hash
+    from app.db.database import SessionLocal, create_tables
+    from app.models.product import Product
+    from app.models.user import User
+
+    create_tables()
+    db = SessionLocal()
+    try:
+        if not db.query(User).filter(User.username == BENCH_USER["username"]).first():
+            db.add(User(
+                email=BENCH_USER["email"],
+                username=BENCH_USER["username"],
+                hashed_password=get_password_hash(BENCH_USER["password"])
+            ))
+        db.add_all([
+            Product(name=f"bench-product-{i}", description="", price=10 + i % 100, stock_quantity=1000)
+            for i in range(products)
+        ])
+        db.commit()
+        return [row.id for row in db.query(Product.id).order_by(Product.id).limit(10)]
+    finally:
+        db.close()
+
+
+async def wait_for_order(http, order_id: int, timeout: float = 60.0) -> str:
+    deadline = asyncio.get_running_loop().time() + timeout
+    while True:
+        response = await http.get(f"/api/orders/{order_id}")
+        response.raise_for_status()
+        order_status = response.json()["status"]
+        if order_status in ("completed", "failed"):
+            return order_status
+        if asyncio.get_running_loop().time() > deadline:
+            raise TimeoutError(f"order {order_id} still {order_status}")
+        await asyncio.sleep(0.02)
+
+
+async def run_scenario(name: str, http, recorder: LatencyRecorder, args, product_ids: list) -> None:
+    async def order_create(i):
+        response = await http.post("/api/orders", json=ORDER)
+        response.raise_for_status()
+
+    async def order_workflow(i):
+        response = await http.post("/api/orders", json=ORDER)
+        response.raise_for_status()
+        async with recorder.measure("workflow:OrderWorkflow"):
+            await wait_for_order(http, response.json()["id"])
+
+    async def product_create(i):
+        product = {"name": f"bench-created-{i}-{datetime.datetime.utcnow().timestamp()}",
+                   "description": "", "price": 10.0, "stock_quantity": 10}
+        response = await http.post("/api/products", json=product)
+        response.raise_for_status()
+
+    async def stock_update(i):
+        product_id = product_ids[i % len(product_ids)]
+        response = await http.patch(
+            f"/api/products/{product_id}/stock",
+            json={"quantity_change": 1 if i % 2 == 0 else -1}
+        )
+        response.raise_for_status()
+
+    async def login(i):
+        response = await http.post("/api/auth/login", json=BENCH_USER)
+        response.raise_for_status()
+
+    async def list_orders(i):
+        response = await http.get("/api/orders", params={"limit": 100})
+        response.raise_for_status()
+
+    async def list_products(i):
+        response = await http.get("/api/products", params={"limit": 100})
+        response.raise_for_status()
+
+    fn = {
+        "order_create": order_create,
+        "order_workflow": order_workflow,
+        "product_create": product_create,
+        "stock_update": stock_update,
+        "login": login,
+        "list_orders": list_orders,
+        "list_products": list_products,
+    }[name]
+    await run_concurrently(recorder, f"endpoint:{name}", args.requests, args.concurrency, fn)
+
+
+async def main(args):
+    recorder = LatencyRecorder()
+    scenarios = args.scenarios or ALL_SCENARIOS
+    needs_temporal = any(name in TEMPORAL_SCENARIOS for name in scenarios)
+
+    # seed() tạo bảng (lifespan của app không chạy qua ASGITransport)
+    product_ids = seed(args.products)
+
+    async with AsyncExitStack() as stack:
+        target = None
+        if needs_temporal:
+            client = await stack.enter_async_context(temporal_environment())
+            target = client.service_client.config.target_host
+            await stack.enter_async_context(running_worker(client, recorder))
+        http = await stack.enter_async_context(api_client(target))
+        # POST /api/orders cần Bearer token của người dùng
+        response = await http.post("/api/auth/login", json=BENCH_USER)
+        response.raise_for_status()
+        http.headers["Authorization"] = f"Bearer {response.json()['access_token']}"
+
+        for name in scenarios:
+            print(f"Running {name} ({args.requests} requests, concurrency {args.concurrency})...")
+            await run_scenario(name, http, recorder, args, product_ids)
+
+    summary = recorder.summary()
+    print()
+    print_summary(summary)
+
+    if args.output:
+        meta = {
+            "revision": git_revision(),
+            "timestamp": datetime.datetime.utcnow().isoformat(),
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "database": os.environ["DATABASE_URL"].split("://")[0],
+        }
+        write_json(args.output, meta, summary)
+        print(f"\nĐã ghi kết quả vào {args.output}")
+    if args.compare:
+        compare(args.compare, summary)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--products", type=int, default=1000, help="số sản phẩm seed cho listing")
+    parser.add_argument("--scenarios", nargs="*", choices=ALL_SCENARIOS)
+    parser.add_argument("--output", help="ghi kết quả JSON vào file này")
+    parser.add_argument("--compare", help="file JSON của lần chạy trước để so sánh")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,66 @@
+"""
+OrderWorkflow với mọi bước là activity thường so với chạy các bước ngắn
+(validate_order, process_payment) dạng local activity: số event trong history
+của mỗi đơn hàng và độ trễ end-to-end.
+
+    python -m benchmarks.bench_local_activities --orders 200 --concurrency 20
+"""
+import argparse
+import asyncio
+import statistics
+import uuid
+
+from benchmarks.harness import (
+    LatencyRecorder,
+    print_summary,
+    running_worker,
+    temporal_environment,
+)
+from benchmarks.bench_task_queues import create_orders
+
+
+async def run_mode(client, recorder: LatencyRecorder, mode: str, local_steps, args) -> float:
+    from app.workers.client import ORDER_TASK_QUEUE
+    from app.workflows.order_workflow import OrderWorkflow
+
+    order_ids = create_orders(args.orders)
+    run_id = uuid.uuid4().hex[:8]
+    semaphore = asyncio.Semaphore(args.concurrency)
+    event_counts = []
+
+    async def order(order_id: int):
+        async with semaphore:
+            async with recorder.measure(f"workflow:OrderWorkflow ({mode})"):
+                handle = await client.start_workflow(
+                    OrderWorkflow.run,
+                    args=[order_id, local_steps],
+                    id=f"bench-local-{run_id}-{order_id}",
+                    task_queue=ORDER_TASK_QUEUE,
+                )
+                await handle.result()
+        history = await handle.fetch_history()
+        event_counts.append(len(history.events))
+
+    await asyncio.gather(*(order(order_id) for order_id in order_ids))
+    return statistics.mean(event_counts)
+
+
+async def main(args):
+    recorder = LatencyRecorder()
+    events = {}
+    async with temporal_environment() as client:
+        async with running_worker(client, recorder):
+            events["activity"] = await run_mode(client, recorder, "activity", [], args)
+            events["local"] = await run_mode(client, recorder, "local", None, args)
+
+    print_summary(recorder.summary())
+    print()
+    for mode, mean_events in events.items():
+        print(f"{mode:<9} history events/order={mean_events:.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--orders", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    asyncio.run(main(parser.parse_args()))
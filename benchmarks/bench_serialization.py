@@ -0,0 +1,106 @@
+"""
+Số dòng/giây khi đọc và serialize một trang danh sách đơn hàng/sản phẩm:
+
+- orm: load ORM object, validate từng dòng qua response model (from_attributes),
+  jsonable_encoder + json.dumps như FastAPI làm với response_model
+- projection: SELECT các cột của response, serialize thẳng bằng orjson
+
+    python -m benchmarks.bench_serialization --rows 5000 --limit 100
+"""
+import argparse
+import json
+import time
+
+from benchmarks.harness import git_revision, write_json
+
+
+def seed(rows: int) -> None:
+    from app.db.database import SessionLocal, create_tables
+    from app.models.order import Order, OrderStatus
+    from app.models.product import Product
+
+    create_tables()
+    db = SessionLocal()
+    try:
+        db.add_all([
+            Order(
+                user_id=1,
+                product_name=f"bench-product-{i % 100}",
+                quantity=1 + i % 5,
+                price=10.0,
+                total_amount=10.0 * (1 + i % 5),
+                shipping_address="123 Benchmark Street, District 1",
+                status=OrderStatus.COMPLETED
+            )
+            for i in range(rows)
+        ])
+        db.add_all([
+            Product(name=f"bench-product-{i}", description="Benchmark product", price=10 + i % 100, stock_quantity=1000)
+            for i in range(rows)
+        ])
+        db.commit()
+    finally:
+        db.close()
+
+
+def orm_page(db, model, schema, limit: int) -> bytes:
+    from fastapi.encoders import jsonable_encoder
+
+    from app.api.pagination import keyset_paginate
+
+    rows, _ = keyset_paginate(db.query(model), model.id, None, limit)
+    content = [schema.model_validate(row) for row in rows]
+    return json.dumps(jsonable_encoder(content), ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def projection_page(db, model, schema, limit: int) -> bytes:
+    from app.api.pagination import keyset_paginate
+    from app.api.serialization import dump_json, response_columns, rows_to_dicts
+
+    rows, _ = keyset_paginate(db.query(*response_columns(model, schema)), model.id, None, limit)
+    return dump_json(rows_to_dicts(rows))
+
+
+def measure(name: str, page, model, schema, limit: int, pages: int) -> float:
+    from app.db.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        page(db, model, schema, limit)  # warm-up (compile cache của SQLAlchemy)
+        start = time.perf_counter()
+        for _ in range(pages):
+            page(db, model, schema, limit)
+            db.expunge_all()
+        elapsed = time.perf_counter() - start
+    finally:
+        db.close()
+    rows_per_s = pages * limit / elapsed
+    print(f"{name:<28} {rows_per_s:>12.0f} rows/s {elapsed / pages * 1000:>9.2f} ms/page")
+    return rows_per_s
+
+
+def main(args):
+    from app.models.order import Order
+    from app.models.product import Product
+    from app.schemas.order import OrderResponse
+    from app.schemas.product import ProductResponse
+
+    seed(args.rows)
+    results = {}
+    for label, model, schema in [("orders", Order, OrderResponse), ("products", Product, ProductResponse)]:
+        before = measure(f"{label} orm+pydantic", orm_page, model, schema, args.limit, args.pages)
+        after = measure(f"{label} projection+orjson", projection_page, model, schema, args.limit, args.pages)
+        print(f"{label:<28} {after / before:>12.2f}x")
+        results[label] = {"orm_rows_per_s": before, "projection_rows_per_s": after}
+
+    if args.output:
+        write_json(args.output, {"revision": git_revision(), "args": vars(args)}, results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=5000, help="số dòng seed mỗi bảng")
+    parser.add_argument("--limit", type=int, default=100, help="số dòng mỗi trang")
+    parser.add_argument("--pages", type=int, default=200, help="số trang đo mỗi cách")
+    parser.add_argument("--output", help="ghi kết quả JSON")
+    main(parser.parse_args())
@@ -0,0 +1,83 @@
+"""
+Benchmark tranh chấp tồn kho: N client đồng thời cập nhật tồn kho của cùng
+một sản phẩm.
+
+    python -m benchmarks.bench_stock_contention --clients 20 --updates 50
+
+So sánh cách đọc-sửa-ghi cũ với UPDATE nguyên tử (adjust_stock), kiểm tra
+không mất cập nhật nào và báo cáo số cập nhật/giây. Mặc định dùng SQLite tạm;
+đặt DATABASE_URL để chạy trên Postgres.
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+
+from app.db.database import AsyncSessionLocal, SessionLocal, engine
+from app.db.inventory import adjust_stock
+from app.models import order as order_model
+from app.models.product import Product
+
+INITIAL_STOCK = 1_000_000
+
+
+async def read_modify_write(product_id: int, delta: int) -> None:
+    # Cách cũ của update_product_stock: đọc, cộng trong Python rồi ghi lại
+    async with AsyncSessionLocal() as db:
+        product = await db.get(Product, product_id)
+        await asyncio.sleep(0)
+        product.stock_quantity = product.stock_quantity + delta
+        await db.commit()
+
+
+async def atomic(product_id: int, delta: int) -> None:
+    async with AsyncSessionLocal() as db:
+        result = await adjust_stock(db, product_id, delta)
+        assert result["success"], result
+
+
+async def run(name: str, update, clients: int, updates: int) -> int:
+    db = SessionLocal()
+    product = Product(name=f"bench-{name}", description="", price=1, stock_quantity=INITIAL_STOCK)
+    db.add(product)
+    db.commit()
+    product_id = product.id
+    db.close()
+
+    async def client(index: int):
+        # Xen kẽ tăng/giảm để tổng thay đổi khác 0 và dễ kiểm tra
+        for i in range(updates):
+            await update(product_id, 2 if i % 2 == 0 else -1)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(i) for i in range(clients)))
+    elapsed = time.perf_counter() - start
+
+    expected = INITIAL_STOCK + clients * sum(2 if i % 2 == 0 else -1 for i in range(updates))
+    db = SessionLocal()
+    actual = db.get(Product, product_id).stock_quantity
+    db.close()
+
+    total = clients * updates
+    print(
+        f"{name:<18} updates={total} {total / elapsed:.0f} updates/s "
+        f"expected={expected} actual={actual} lost={abs(expected - actual)}"
+    )
+    return expected - actual
+
+
+async def main(args):
+    order_model.Base.metadata.create_all(bind=engine)
+    await run("read-modify-write", read_modify_write, args.clients, args.updates)
+    lost = await run("atomic", atomic, args.clients, args.updates)
+    assert lost == 0, f"atomic stock updates lost {lost} units"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=20)
+    parser.add_argument("--updates", type=int, default=50)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,135 @@
+"""
+So sánh thông lượng khi chạy mọi domain trên một task queue với khi tách
+task queue theo domain (auth/order/product), dưới tải hỗn hợp: đăng ký người dùng
+(bcrypt), kiểm tra tồn kho thấp và xử lý đơn hàng cùng lúc.
+
+    python -m benchmarks.bench_task_queues --orders 200 --registrations 100 --inventory-checks 50
+
+Số liệu chính là độ trễ end-to-end của OrderWorkflow: khi dùng chung một queue,
+các activity bcrypt chiếm hết slot và đơn hàng phải chờ. Hai chế độ có cùng tổng
+số slot activity: khi tách queue, mỗi Worker nhận 1/3 số slot.
+"""
+import argparse
+import asyncio
+import time
+import uuid
+
+from benchmarks.harness import (
+    LatencyRecorder,
+    print_summary,
+    running_worker,
+    temporal_environment,
+)
+
+SINGLE_QUEUE = "bench-single-queue"
+
+
+def create_orders(count: int) -> list:
+    from app.db.database import SessionLocal, create_tables
+    from app.models.order import Order, OrderStatus
+
+    create_tables()
+    db = SessionLocal()
+    try:
+        orders = [
+            Order(
+                user_id=1,
+                product_name="Benchmark product",
+                quantity=1,
+                price=100.0,
+                total_amount=100.0,
+                shipping_address="123 Benchmark Street, District 1",
+                status=OrderStatus.RECEIVED,
+            )
+            for _ in range(count)
+        ]
+        db.add_all(orders)
+        db.commit()
+        return [order.id for order in orders]
+    finally:
+        db.close()
+
+
+async def run_mode(client, mode: str, args) -> dict:
+    from app.workers.client import TASK_QUEUES
+    from app.workflows.auth_workflow import AuthWorkflow
+    from app.workflows.order_workflow import OrderWorkflow
+    from app.workflows.product_workflow import ProductInventoryCheckWorkflow
+
+    recorder = LatencyRecorder()
+    single_queue = SINGLE_QUEUE if mode == "single" else None
+
+    def queue(domain: str) -> str:
+        return single_queue or TASK_QUEUES[domain]
+
+    order_ids = create_orders(args.orders)
+    run_id = uuid.uuid4().hex[:8]
+    # Cùng tổng số slot activity ở cả hai chế độ, chỉ khác cách chia theo queue
+    slots = args.max_concurrent_activities
+    if single_queue is None:
+        slots = max(1, slots // len(TASK_QUEUES))
+    overrides = {"max_concurrent_activities": slots}
+
+    async with running_worker(client, recorder, single_queue=single_queue, **overrides):
+        async def register(i: int):
+            await client.execute_workflow(
+                AuthWorkflow.run,
+                {"email": f"bench-{run_id}-{i}@example.com", "username": f"bench-{run_id}-{i}", "password": "pw"},
+                id=f"bench-auth-{run_id}-{i}",
+                task_queue=queue("auth"),
+            )
+
+        async def inventory_check(i: int):
+            await client.execute_workflow(
+                ProductInventoryCheckWorkflow.run,
+                10,
+                id=f"bench-inventory-{run_id}-{i}",
+                task_queue=queue("product"),
+            )
+
+        async def order(order_id: int):
+            async with recorder.measure("workflow:OrderWorkflow"):
+                await client.execute_workflow(
+                    OrderWorkflow.run,
+                    order_id,
+                    id=f"bench-order-{run_id}-{order_id}",
+                    task_queue=queue("order"),
+                )
+
+        start = time.perf_counter()
+        # Tải nền (auth, product) được gửi trước để chiếm slot của worker
+        background = [asyncio.create_task(register(i)) for i in range(args.registrations)]
+        background += [asyncio.create_task(inventory_check(i)) for i in range(args.inventory_checks)]
+        await asyncio.sleep(0.1)
+        await asyncio.gather(*(order(order_id) for order_id in order_ids))
+        orders_elapsed = time.perf_counter() - start
+        await asyncio.gather(*background, return_exceptions=True)
+
+    recorder.elapsed["workflow:OrderWorkflow"] = orders_elapsed
+    summary = recorder.summary()
+    print(f"\n=== {mode} queue ===")
+    print_summary(summary)
+    return summary
+
+
+async def main(args):
+    async with temporal_environment() as client:
+        results = {mode: await run_mode(client, mode, args) for mode in ("single", "split")}
+
+    print()
+    for mode, summary in results.items():
+        entry = summary.get("workflow:OrderWorkflow", {})
+        print(
+            f"{mode:<7} orders/s={entry.get('throughput_per_s', 0):.1f} "
+            f"p50={entry.get('p50_ms', 0):.1f}ms p95={entry.get('p95_ms', 0):.1f}ms"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--orders", type=int, default=200)
+    parser.add_argument("--registrations", type=int, default=100)
+    parser.add_argument("--inventory-checks", type=int, default=50)
+    parser.add_argument("--max-concurrent-activities", type=int, default=20,
+                        help="tổng số activity đồng thời, chia đều cho các Worker khi tách queue")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,102 @@
+"""
+Micro-benchmark: độ trễ POST /api/orders/batch (một đơn hàng, start workflow
+trong request) khi mở kết nối Temporal mỗi request so với dùng TemporalClientManager chung.
+POST /api/orders không còn gọi Temporal (workflow được start qua outbox).
+
+    python -m benchmarks.bench_temporal_client --requests 200 --concurrency 10
+
+Mặc định dùng SQLite tạm và Temporal dev server cục bộ (WorkflowEnvironment);
+đặt TEMPORAL_SERVER_URL để dùng server có sẵn.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "30")
+
+import httpx
+from temporalio.client import Client
+from temporalio.testing import WorkflowEnvironment
+
+from app.core.codec import create_data_converter
+from app.core.security import create_access_token
+from app.db.database import create_tables
+from app.main import app
+from app.workers.client import TemporalClientManager, get_temporal_client
+
+ORDER = {
+    "product_name": "Benchmark product",
+    "quantity": 1,
+    "price": 100.0,
+    "shipping_address": "123 Benchmark Street, District 1",
+}
+
+
+async def run_requests(total: int, concurrency: int) -> list:
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=app)
+    # Token mang sẵn uid nên không cần tạo người dùng trong database
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': 'bench', 'uid': 1})}"}
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", headers=headers) as http:
+        async def one():
+            async with semaphore:
+                start = time.perf_counter()
+                response = await http.post("/api/orders/batch", json={"orders": [ORDER]})
+                latencies.append(time.perf_counter() - start)
+                response.raise_for_status()
+
+        await asyncio.gather(*(one() for _ in range(total)))
+    return latencies
+
+
+def report(name: str, latencies: list) -> None:
+    latencies = sorted(latencies)
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(
+        f"{name:<12} n={len(latencies)} "
+        f"mean={statistics.mean(latencies) * 1000:.2f}ms "
+        f"p50={statistics.median(latencies) * 1000:.2f}ms "
+        f"p95={p95 * 1000:.2f}ms"
+    )
+
+
+async def main(args):
+    # ASGITransport không chạy lifespan nên bảng được tạo tại đây
+    create_tables()
+    env = None
+    target = os.getenv("TEMPORAL_SERVER_URL")
+    if not target:
+        env = await WorkflowEnvironment.start_local()
+        target = env.client.service_client.config.target_host
+
+    try:
+        # Cách cũ: mỗi request tạo một kết nối gRPC mới
+        async def connect_per_request() -> Client:
+            return await Client.connect(target, data_converter=create_data_converter())
+
+        app.dependency_overrides[get_temporal_client] = connect_per_request
+        report("per-request", await run_requests(args.requests, args.concurrency))
+        app.dependency_overrides.clear()
+
+        # Cách mới: một manager dùng chung
+        app.state.temporal = TemporalClientManager(target_host=target)
+        report("shared", await run_requests(args.requests, args.concurrency))
+        await app.state.temporal.close()
+    finally:
+        if env is not None:
+            await env.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=10)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,242 @@
+"""
+Hạ tầng dùng chung cho các benchmark: database tạm, Temporal (dev server cục bộ
+hoặc server có sẵn), worker chạy trong cùng process, ASGI client cho FastAPI
+và bộ ghi độ trễ.
+
+Import module này trước khi import ``app`` để các biến môi trường mặc định
+(SQLite tạm, SECRET_KEY, ...) có hiệu lực.
+"""
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import tempfile
+import time
+from collections import defaultdict
+from contextlib import AsyncExitStack, asynccontextmanager
+from typing import Any, Dict, List, Optional
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "30")
+# Worker, API và client chạy cùng process nên claim-check dùng được blob store trên filesystem
+os.environ.setdefault("PAYLOAD_CLAIM_CHECK_URL", f"file://{tempfile.mkdtemp()}/temporal-payloads")
+
+import httpx
+from temporalio import activity
+from temporalio.client import Client
+from temporalio.testing import WorkflowEnvironment
+from temporalio.worker import (
+    ActivityInboundInterceptor,
+    ExecuteActivityInput,
+    Interceptor,
+    Worker,
+)
+
+
+class LatencyRecorder:
+    """
+    Ghi độ trễ theo tên (endpoint, activity, workflow) và tính p50/p95/p99
+    """
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.elapsed: Dict[str, float] = {}
+
+    def record(self, name: str, seconds: float) -> None:
+        self.samples[name].append(seconds)
+
+    def error(self, name: str) -> None:
+        self.errors[name] += 1
+
+    @asynccontextmanager
+    async def measure(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.error(name)
+            raise
+        self.record(name, time.perf_counter() - start)
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        result = {}
+        for name in sorted(set(self.samples) | set(self.errors)):
+            samples = sorted(self.samples.get(name, []))
+            entry: Dict[str, Any] = {"count": len(samples), "errors": self.errors.get(name, 0)}
+            if samples:
+                entry.update({
+                    "mean_ms": statistics.mean(samples) * 1000,
+                    "p50_ms": percentile(samples, 50) * 1000,
+                    "p95_ms": percentile(samples, 95) * 1000,
+                    "p99_ms": percentile(samples, 99) * 1000,
+                })
+            if name in self.elapsed and self.elapsed[name] > 0:
+                entry["throughput_per_s"] = len(samples) / self.elapsed[name]
+            result[name] = entry
+        return result
+
+
+def percentile(sorted_samples: List[float], pct: float) -> float:
+    index = max(0, min(len(sorted_samples) - 1, int(round(pct / 100 * len(sorted_samples))) - 1))
+    return sorted_samples[index]
+
+
+class _ActivityTimingInterceptor(Interceptor):
+    def __init__(self, recorder: LatencyRecorder):
+        self.recorder = recorder
+
+    def intercept_activity(self, next: ActivityInboundInterceptor) -> ActivityInboundInterceptor:
+        return _ActivityTimingInbound(next, self.recorder)
+
+
+class _ActivityTimingInbound(ActivityInboundInterceptor):
+    def __init__(self, next: ActivityInboundInterceptor, recorder: LatencyRecorder):
+        super().__init__(next)
+        self.recorder = recorder
+
+    async def execute_activity(self, input: ExecuteActivityInput) -> Any:
+        async with self.recorder.measure(f"activity:{activity.info().activity_type}"):
+            return await super().execute_activity(input)
+
+
+@asynccontextmanager
+async def temporal_environment(target: Optional[str] = None):
+    """
+    Trả về Temporal client: server theo ``target``/TEMPORAL_SERVER_URL nếu có,
+    nếu không thì khởi động dev server cục bộ (tải Temporal CLI lần đầu).
+    """
+    from app.core.codec import create_data_converter
+
+    # Cùng data converter (nén, claim-check) với worker và API của ứng dụng
+    target = target or os.getenv("TEMPORAL_SERVER_URL")
+    if target:
+        yield await Client.connect(target, data_converter=create_data_converter())
+        return
+
+    env = await WorkflowEnvironment.start_local(data_converter=create_data_converter())
+    try:
+        yield env.client
+    finally:
+        await env.shutdown()
+
+
+@asynccontextmanager
+async def running_worker(client: Client, recorder: LatencyRecorder, single_queue: Optional[str] = None, **overrides):
+    """
+    Chạy worker của ứng dụng trong process hiện tại: mỗi domain một Worker trên
+    task queue riêng, hoặc toàn bộ trên ``single_queue`` nếu được chỉ định
+    """
+    from app.workers.worker import ACTIVITIES, DOMAINS, WORKFLOWS, WORKFLOW_RUNNER, create_worker
+
+    interceptors = [_ActivityTimingInterceptor(recorder)]
+    if single_queue:
+        workers = [Worker(
+            client,
+            task_queue=single_queue,
+            workflows=WORKFLOWS,
+            activities=ACTIVITIES,
+            interceptors=interceptors,
+            workflow_runner=WORKFLOW_RUNNER,
+            **overrides,
+        )]
+    else:
+        workers = [
+            create_worker(client, domain, interceptors=interceptors, overrides=overrides)
+            for domain in DOMAINS
+        ]
+
+    async with AsyncExitStack() as stack:
+        for worker in workers:
+            await stack.enter_async_context(worker)
+        yield workers
+
+
+@asynccontextmanager
+async def api_client(temporal_target: Optional[str] = None):
+    """
+    httpx client gọi thẳng ứng dụng FastAPI qua ASGI transport
+    """
+    from app.db.database import create_tables
+    from app.main import app
+    from app.workers.client import TemporalClientManager
+    from app.workers.outbox import OrderOutboxDispatcher
+
+    # ASGITransport không chạy lifespan, tự tạo bảng, client manager và outbox dispatcher
+    create_tables()
+    manager = TemporalClientManager(target_host=temporal_target)
+    app.state.temporal = manager
+    app.state.outbox = OrderOutboxDispatcher(manager)
+    app.state.outbox.start()
+    transport = httpx.ASGITransport(app=app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as http:
+            yield http
+    finally:
+        await app.state.outbox.stop()
+        await manager.close()
+
+
+async def run_concurrently(recorder: LatencyRecorder, name: str, total: int, concurrency: int, fn) -> None:
+    """
+    Gọi ``fn(i)`` ``total`` lần với tối đa ``concurrency`` lần chạy đồng thời,
+    ghi độ trễ và thông lượng dưới tên ``name``
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int):
+        async with semaphore:
+            try:
+                async with recorder.measure(name):
+                    await fn(i)
+            except Exception as e:
+                print(f"{name} #{i} failed: {e}")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    recorder.elapsed[name] = time.perf_counter() - start
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except Exception:
+        return None
+
+
+def print_summary(summary: Dict[str, Dict[str, Any]]) -> None:
+    print(f"{'name':<40} {'count':>7} {'err':>5} {'rps':>9} {'p50':>9} {'p95':>9} {'p99':>9}")
+    for name, entry in summary.items():
+        def ms(key):
+            return f"{entry[key]:.2f}" if key in entry else "-"
+        rps = f"{entry['throughput_per_s']:.1f}" if "throughput_per_s" in entry else "-"
+        print(
+            f"{name:<40} {entry['count']:>7} {entry['errors']:>5} {rps:>9} "
+            f"{ms('p50_ms'):>9} {ms('p95_ms'):>9} {ms('p99_ms'):>9}"
+        )
+
+
+def write_json(path: str, meta: Dict[str, Any], summary: Dict[str, Dict[str, Any]]) -> None:
+    with open(path, "w") as f:
+        json.dump({"meta": meta, "results": summary}, f, indent=2, sort_keys=True)
+
+
+def compare(baseline_path: str, summary: Dict[str, Dict[str, Any]], metric: str = "p95_ms") -> None:
+    """
+    So sánh với kết quả JSON của một lần chạy trước (ví dụ ở commit khác)
+    """
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"\nSo sánh {metric} với {baseline_path} ({baseline['meta'].get('revision')})")
+    for name, entry in summary.items():
+        old = baseline["results"].get(name, {}).get(metric)
+        new = entry.get(metric)
+        if old is None or new is None:
+            continue
+        change = (new - old) / old * 100 if old else 0.0
+        print(f"{name:<40} {old:>9.2f} -> {new:>9.2f} ({change:+.1f}%)")